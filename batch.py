@@ -0,0 +1,130 @@
+from scheduleAssistant import ScheduleAssistant, CourseQuery
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import signal
+import threading
+import time
+
+# Assistant with the catalog loaded, one per process
+assistant = None
+
+# Schedules counted at most for a query, unless the query sets "maxCombinaciones"
+maxCombinations = 100000
+
+# Aborts the running query when its deadline passes (SIGALRM handler)
+def queryTimeout(signum, frame):
+	raise TimeoutError("La consulta supero su tiempo limite")
+
+# Loads a courses dictionary into the assistant of the current process (as compact records with compact), compiling its masks and indexes once
+def initWorker(data, compact=False):
+	global assistant
+	with contextlib.redirect_stdout(io.StringIO()):
+		assistant = ScheduleAssistant()
+	assistant.logCurrentProcess = False
+	assistant.useCompactModel = compact
+	assistant.setCoursesData(data)
+	assistant.compileSectionMasks()
+	assistant.buildIndexes()
+
+# Answers one query: {"id", "cursos": [codes], and optionally "docente", "horaInicio", "horaFin", "duracion", "vacantesLibres",
+# "restricciones" (see getConstraintNames), "orden" (a criteria of getRankCriteria), "limite" (schedules to return, 10 by default),
+# "contar" (false to skip the count), "maxCombinaciones" (schedules counted at most, null for no limit; the ranking always examines them all) and
+# "segundosMax" (deadline, the query fails with TimeoutError once it passes; needs SIGALRM timers, so only in the main thread on Unix).
+# A count that reached the limit is reported as that limit with "cantidadExacta" false
+def runQuery(query):
+	start = time.perf_counter()
+	result = {"id": query.get("id")}
+	timer = query.get("segundosMax") is not None and hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+	try:
+		if timer:
+			signal.signal(signal.SIGALRM, queryTimeout)
+			signal.setitimer(signal.ITIMER_REAL, query["segundosMax"])
+		codes = query["cursos"]
+		if len(codes) == 0:
+			raise ValueError("Falta la lista de cursos")
+		unknown = [code for code in codes if code not in assistant.coursesDataDict]
+		if len(unknown) > 0:
+			raise ValueError(f"Cursos no encontrados: {', '.join(unknown)}")
+
+		courseQuery = CourseQuery(assistant).courses(codes).constraints(**query.get("restricciones", {}))
+		if "docente" in query:
+			courseQuery.prof(query["docente"])
+		if "horaInicio" in query:
+			courseQuery.minBegTime(query["horaInicio"])
+		if "horaFin" in query:
+			courseQuery.maxEndTime(query["horaFin"])
+		if "duracion" in query:
+			courseQuery.durTime(query["duracion"])
+		if "vacantesLibres" in query:
+			courseQuery.minFreeSeats(query["vacantesLibres"])
+
+		data = courseQuery.data()
+		result["sinSecciones"] = [code for code in codes if code not in data]
+		limit = query.get("limite", 10)
+		maxCount = query.get("maxCombinaciones", maxCombinations)
+		empty = len(data) == 0 or len(result["sinSecciones"]) > 0
+		if query.get("contar", True):
+			count = 0 if empty else courseQuery.count(None if maxCount is None else maxCount + 1)
+			result["cantidad"] = count if maxCount is None else min(count, maxCount)
+			result["cantidadExacta"] = maxCount is None or count <= maxCount
+		if empty:
+			result["horarios"] = []
+		elif "orden" in query:
+			best = assistant.getBestSchedules(data, query["orden"], limit, compact=True, constraints=courseQuery.limits)
+			result["horarios"] = [{"puntaje": score, "secciones": [list(pair) for pair in comb]} for score, comb in best]
+		else:
+			result["horarios"] = [{"secciones": [list(pair) for pair in comb]} for comb in courseQuery.schedules(limit, compact=True)]
+	except Exception as e:
+		result["error"] = f"{type(e).__name__}: {e}"
+	finally:
+		if timer:
+			signal.setitimer(signal.ITIMER_REAL, 0)
+	result["segundos"] = time.perf_counter() - start
+	return result
+
+# Reads the queries of a JSON lines file, skipping blank lines
+def readQueries(fileName):
+	with open(fileName, "r") as file:
+		return [json.loads(line) for line in file if line.strip() != ""]
+
+#
+# MAIN
+#
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Responde en lote consultas de horarios (JSON lines) sobre un catalogo cargado una sola vez")
+	parser.add_argument("consultas", help="Archivo de consultas, una por linea: {\"id\", \"cursos\": [...], \"docente\", \"horaInicio\", \"horaFin\", \"duracion\", \"vacantesLibres\", \"restricciones\", \"orden\", \"limite\", \"contar\", \"maxCombinaciones\", \"segundosMax\"}")
+	parser.add_argument("resultados", help="Archivo donde escribir los resultados (JSON lines, en el orden de las consultas)")
+	parser.add_argument("--procesos", type=int, default=os.cpu_count(), help="Procesos que responden consultas (por defecto uno por CPU)")
+	parser.add_argument("--segundos-max", type=float, default=None, help="Tiempo limite por consulta, para las que no fijan segundosMax (por defecto sin limite)")
+	parser.add_argument("--json", default=ScheduleAssistant.jsonName, help=f"Catalogo de cursos en JSON (por defecto {ScheduleAssistant.jsonName})")
+	args = parser.parse_args()
+
+	start = time.perf_counter()
+	with open(args.json, "r") as file:
+		data = json.load(file)
+	queries = readQueries(args.consultas)
+	if args.segundos_max is not None:
+		queries = [{"segundosMax": args.segundos_max, **query} for query in queries]
+	loaded = time.perf_counter()
+
+	if args.procesos > 1:
+		with concurrent.futures.ProcessPoolExecutor(max_workers=args.procesos, initializer=initWorker, initargs=(data,)) as executor:
+			results = executor.map(runQuery, queries, chunksize=max(1, len(queries) // (args.procesos * 4)))
+			with open(args.resultados, "w") as file:
+				for result in results:
+					file.write(json.dumps(result) + "\n")
+	else:
+		initWorker(data)
+		with open(args.resultados, "w") as file:
+			for query in queries:
+				file.write(json.dumps(runQuery(query)) + "\n")
+
+	elapsed = time.perf_counter() - loaded
+	print(f"Catalogo cargado en {loaded - start:.3f} s")
+	print(f"{len(queries)} consultas respondidas en {elapsed:.3f} s ({len(queries) / elapsed if elapsed > 0 else 0:.1f} consultas/s)")
+	print(f"Resultados guardados en {args.resultados}")
@@ -0,0 +1,170 @@
+from scheduleAssistant import ScheduleAssistant, CourseQuery
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+#
+# SYNTHETIC DATA
+#
+
+header = ("Codigo", "Curso", "Docente", "Malla", "Tipo", "Modalidad", "Seccion", "Sesion", "Horario", "Semana", "Ubicacion", "Vacantes", "Matriculados")
+dias = ["Lun", "Mar", "Mie", "Jue", "Vie", "Sab"]
+sizes = {
+	"chico": {"courses": 40, "sections": 4, "sessions": 2, "selected": 5},
+	"mediano": {"courses": 200, "sections": 6, "sessions": 3, "selected": 6},
+	"grande": {"courses": 800, "sections": 8, "sessions": 3, "selected": 7}
+}
+
+# Generates rows as the ones of coursesDataTable (header included). Sessions start at a pool of day-hour slots
+# whose size shrinks with the clash density (0: spread over the whole week, 1: crowded on the fewest slots). The
+# sessions of a section always fall on different days, so every generated section is valid
+def syntheticTable(courses=100, sections=6, sessions=2, clash=0.3, seed=0):
+	rng = random.Random(seed)
+	slots = [(dia, hora) for dia in dias for hora in range(7, 21)]
+	rng.shuffle(slots)
+	slots = slots[:max(len(dias), round(len(slots) * (1 - clash)))]
+	profs = [f"Apellido{i} Nombre{i}" for i in range(max(1, courses // 2))]
+	table = [header]
+	for c in range(courses):
+		code = f"CS{1000 + c}"
+		for sec in range(1, sections + 1):
+			vac = rng.randint(20, 40)
+			mat = rng.randint(0, vac)
+			used = set()
+			for ses in range(min(sessions, len(dias))):
+				options = [i for i in slots if i[0] not in used] or [(dia, rng.randint(7, 20)) for dia in dias if dia not in used]
+				dia, hora = rng.choice(options)
+				used.add(dia)
+				dur = min(rng.choice([1, 2, 2, 3]), 24 - hora)
+				table.append((
+					code, f"Curso {c}", rng.choice(profs), "2018", "Obligatorio", "Presencial", sec, f"Teoria {ses + 1}",
+					f"{dia}. {hora:02d}:00 - {hora + dur:02d}:00", "Semana General", "A101", vac, mat
+				))
+	return table
+
+# Builds a ScheduleAssistant with a synthetic catalog loaded, without writing any file
+def syntheticAssistant(table):
+	assistant = ScheduleAssistant()
+	assistant.logCurrentProcess = False
+	assistant.saveDataCSV = False
+	assistant.saveDataJSON = False
+	assistant.useParseCache = False
+	assistant.coursesDataTable = table
+	assistant.tableToDict()
+	return assistant
+
+#
+# MEASUREMENT
+#
+
+# Runs a func repeat times, returning the best wall time, its result and (if traced) the peak memory of one more traced run
+def measure(func, repeat=3, traceMemory=True):
+	best = None
+	for i in range(repeat):
+		gc.collect()
+		start = time.perf_counter()
+		result = func()
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	peak = None
+	if traceMemory:
+		gc.collect()
+		tracemalloc.start()
+		func()
+		peak = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+	return best, result, peak
+
+# Times every stage (table to dict, validation, filters, schedule count and generation) over a synthetic catalog
+def benchmarkSize(name, size, clash, seed, repeat, traceMemory):
+	table = syntheticTable(size["courses"], size["sections"], size["sessions"], clash, seed)
+	assistant = syntheticAssistant(table)
+	selected = dict(list(assistant.coursesDataDict.items())[:size["selected"]])
+	sectionsCount = sum(len(i["secciones"]) for i in assistant.coursesDataDict.values())
+
+	stages = [
+		("tablaADict", lambda : assistant.setCoursesData(assistant.rowsToDict(table)), len(table) - 1, "filas"),
+		("validacion", lambda : assistant.validateCoursesData(), sectionsCount, "secciones"),
+		("indices", lambda : assistant.buildIndexes(), sectionsCount, "secciones"),
+		("filtroProfesor", lambda : assistant.filterByProf("apellido1,apellido2"), sectionsCount, "secciones"),
+		("filtroInicio", lambda : assistant.filterByMinBegTime(10), sectionsCount, "secciones"),
+		("filtroFin", lambda : assistant.filterByMaxEndTime(18), sectionsCount, "secciones"),
+		("filtroDuracion", lambda : assistant.filterByDurTime(2), sectionsCount, "secciones"),
+		("consulta", lambda : CourseQuery(assistant).minBegTime(8).maxEndTime(20).minFreeSeats(1).data(), sectionsCount, "secciones"),
+		("conteo", lambda : assistant.countSchedules(selected), None, "horarios"),
+		("generacion", lambda : sum(1 for i in assistant.iterSchedules(selected, compact=True)), None, "horarios"),
+		("generacionSemanas", lambda : sum(1 for i in assistant.iterSchedules(selected, limit=2000)), None, "horarios")
+	]
+
+	results = {}
+	for stage, func, items, unit in stages:
+		elapsed, result, peak = measure(func, repeat, traceMemory)
+		items = result if items is None else items
+		results[stage] = {
+			"segundos": elapsed,
+			"items": items,
+			"unidad": unit,
+			"porSegundo": items / elapsed if elapsed > 0 else None,
+			"memoriaPico": peak
+		}
+		print(f"  {name:8} {stage:18} {elapsed * 1000:10.2f} ms {results[stage]['porSegundo'] or 0:14.0f} {unit}/s" + (f" {peak / 1024:10.0f} KiB" if peak is not None else ""))
+	return results
+
+# Gets the current git commit (to label the results), or "local" outside a git checkout
+def currentCommit():
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout.strip()
+	except Exception:
+		return "local"
+
+# Prints the time ratio of every stage against previously saved results (< 1 is faster)
+def compare(results, previousFile):
+	with open(previousFile, "r") as file:
+		previous = json.load(file)
+	print(f"\nComparacion con {previous['etiqueta']} (tiempo actual / anterior):")
+	for name, stages in results["tamanos"].items():
+		for stage, data in stages.items():
+			old = previous["tamanos"].get(name, {}).get(stage)
+			if old is not None and old["segundos"] > 0:
+				print(f"  {name:8} {stage:18} {data['segundos'] / old['segundos']:8.2f}x")
+
+#
+# MAIN
+#
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Benchmark offline de la lectura, filtrado y generacion de horarios con catalogos sinteticos")
+	parser.add_argument("--tamanos", nargs="+", default=list(sizes), choices=list(sizes), help="Tamanos de catalogo a medir")
+	parser.add_argument("--choques", type=float, default=0.3, help="Densidad de choques entre sesiones, de 0 a 1 (por defecto 0.3)")
+	parser.add_argument("--semilla", type=int, default=0, help="Semilla del generador sintetico")
+	parser.add_argument("--repeticiones", type=int, default=3, help="Repeticiones por etapa (se reporta el mejor tiempo)")
+	parser.add_argument("--sin-memoria", action="store_true", help="No medir la memoria pico (evita una corrida extra con tracemalloc)")
+	parser.add_argument("--salida", default="", help="Archivo JSON donde guardar los resultados (por defecto benchmarks/<commit>.json)")
+	parser.add_argument("--comparar", default="", help="Archivo JSON de resultados anteriores con el cual comparar")
+	args = parser.parse_args()
+
+	label = currentCommit()
+	results = {
+		"etiqueta": label,
+		"python": platform.python_version(),
+		"choques": args.choques,
+		"semilla": args.semilla,
+		"tamanos": {}
+	}
+	for name in args.tamanos:
+		results["tamanos"][name] = benchmarkSize(name, sizes[name], args.choques, args.semilla, args.repeticiones, not args.sin_memoria)
+
+	output = args.salida or os.path.join("benchmarks", f"{label}.json")
+	os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+	with open(output, "w") as file:
+		json.dump(results, file, indent=4)
+	print(f"\nResultados guardados en {output}")
+
+	if args.comparar != "":
+		compare(results, args.comparar)
@@ -1,8 +1,8 @@
 from scheduleAssistant import ScheduleAssistant
 
-assistant = ScheduleAssistant(input("Email: "), input("Password: "))
+assistant = ScheduleAssistant()
 assistant.initWebdriver()
-assistant.login()
+if not assistant.hasSession():
+	assistant.login(input("Email: "), input("Password: "), False)
 assistant.downloadScheduleData()
-assistant.pdfToTable()
-assistant.tableToDict()
+assistant.pdfToDict()
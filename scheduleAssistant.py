@@ -1,12 +1,29 @@
 # Import standard libraries
+import collections.abc
+import concurrent.futures
+import contextlib
 import csv
+import ctypes
+import functools
+import hashlib
+import heapq
+import http.client
 import itertools
 import json
 import math
+import pickle
 import sys
 import time
 import os
+import urllib.parse
+import urllib.request
 import platform
+import random
+import re
+import select
+import shutil
+import sqlite3
+import tracemalloc
 from datetime import datetime
 
 # Import pre-req third party libraries
@@ -24,6 +41,18 @@ except ModuleNotFoundError as error:
 	command = lib if lib not in pipInstall else pipInstall[lib]
 	sys.exit(f"ERROR: Libreria {lib} no encontrada\nInstalar con el comando 'pip install {command}'")
 
+# Records the wall time and peak memory of a ScheduleAssistant method as the given phase, only while collectMetrics is on
+def measuredPhase(name):
+	def decorator(func):
+		@functools.wraps(func)
+		def wrapper(self, *args, **kwargs):
+			if not self.collectMetrics:
+				return func(self, *args, **kwargs)
+			with self.measurePhase(name):
+				return func(self, *args, **kwargs)
+		return wrapper
+	return decorator
+
 class ScheduleAssistant:
 
 	#
@@ -33,6 +62,7 @@ class ScheduleAssistant:
 	sisURL = "https://sistema-academico.utec.edu.pe"
 	loginPage = "/access"
 	downloadPage = "/students/view/enabled-courses"
+	reportURL = "" # URL of the courses pdf for fetchScheduleData (captured by downloadScheduleData if empty)
 
 	#
 	# BOOLS
@@ -41,6 +71,12 @@ class ScheduleAssistant:
 	logCurrentProcess = True
 	saveDataCSV = True
 	saveDataJSON = True
+	saveDataSQLite = False
+	useParseCache = True
+	persistSession = True
+	useCompactModel = False # Keep the loaded catalog as slotted Course / Section / Session records instead of nested dicts (less memory, slower loading and ranking)
+	collectMetrics = False # Record per-phase time and memory and search counters (see getMetrics)
+	metricsMemory = True # Also trace the peak memory of each phase while collecting metrics (slower)
 
 	#
 	# FILE / DIR NAMES
@@ -49,9 +85,15 @@ class ScheduleAssistant:
 	chromedriverName = "chromedriver"
 	geckodriverName = "geckodriver"
 	downDir = ".down"
+	profileDir = ".perfil"
+	cookiesName = ".sesion.json"
+	fetchStateName = ".descarga.json"
 	pdfName = "horarios.pdf"
 	csvName = "horarios.csv"
 	jsonName = "horarios.json"
+	sqliteName = "horarios.db"
+	cacheName = ".horarios.cache"
+	metricsName = "metricas.json"
 
 	#
 	# TEMP DATA CONTAINERS
@@ -59,18 +101,35 @@ class ScheduleAssistant:
 
 	coursesDataTable = []
 	coursesDataDict = {}
+	sectionMasks = {}
+	indexes = None
+	parseCache = None
+	catalogHash = None
+	httpConnections = {}
+	metrics = None
+	metricsStack = []
 
 	#
 	# TIME VARS
 	#
 
 	timeout = 30
+	downloadSettleTime = 0.05 # Time without changes after which a downloaded file is considered complete
+
+	#
+	# WORKERS
+	#
+
+	pdfWorkers = 1 # Worker processes used to read page ranges of the pdf in parallel
 
 	#
 	# CONSTANTS
 	#
 
 	dias = ["lun", "mar", "mie", "jue", "vie", "sab", "dom"]
+	partialDownloadExts = (".crdownload", ".part", ".tmp")
+	inotifyEvents = 0x2 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200 # IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+	parseCacheVersion = 1 # Bump whenever pdfToTable or tableToDict change their output
 
 	#
 	# INIT
@@ -81,12 +140,19 @@ class ScheduleAssistant:
 		print("-" * 29 + "\n\n  SCHEDULE ASSISTANT - UTEC\n\n" + "-" * 29)
 		self.email = email
 		self.passw = passw
+		self.coursesDataTable = []
+		self.coursesDataDict = {}
+		self.sectionMasks = {}
+		self.httpConnections = {}
+		self.seatBounds = None
+		self.resetMetrics()
 	
 	# Destructor - Cleans the console
 	def __del__(self):
 		self.log("")
 
 	# Initializes the webdriver with the selected browser
+	@measuredPhase("webdriver")
 	def initWebdriver(self, selBrowser="C"):
 		self.log("Inicializando web driver...")
 
@@ -104,6 +170,8 @@ class ScheduleAssistant:
 			options.add_experimental_option("excludeSwitches", ["enable-automation"])
 			options.add_experimental_option('useAutomationExtension', False)
 			options.add_argument('--disable-blink-features=AutomationControlled')
+			if self.persistSession:
+				options.add_argument(f"--user-data-dir={os.path.join(os.getcwd(), self.profileDir, 'chrome')}")
 		elif selBrowser == "F":
 			options = webdriver.FirefoxOptions()
 			options.set_preference("browser.download.folderList", 2)
@@ -116,6 +184,11 @@ class ScheduleAssistant:
 			options.set_preference("browser.download.manager.showAlertOnComplete", False)
 			options.set_preference("browser.download.manager.closeWhenDone", True)
 			options.set_preference("pdfjs.disabled", True)
+			if self.persistSession:
+				profilePath = os.path.join(os.getcwd(), self.profileDir, "firefox")
+				os.makedirs(profilePath, exist_ok=True)
+				options.add_argument("-profile")
+				options.add_argument(profilePath)
 		else:
 			self.error("\nbrowser solo puede ser 'C' (Chrome) o 'F' (Firefox)")
 			return False
@@ -142,17 +215,115 @@ class ScheduleAssistant:
 	# LOG FUNCS
 	#
 
-	# Cleans last log message and prints a new one in the same line
+	# Cleans last log message and prints a new one in the same line (one message per line if stdout isn't a terminal)
 	def log(self, msg):
 		if self.logCurrentProcess:
-			sys.stdout.write("\r" + (" " * os.get_terminal_size().columns))
 			msg = f"# {msg}" if len(msg) > 0 else msg
+			if not sys.stdout.isatty():
+				if len(msg) > 0:
+					print(msg)
+				return
+			sys.stdout.write("\r" + (" " * shutil.get_terminal_size().columns))
 			sys.stdout.write("\r" + msg)
 			sys.stdout.flush()
 	
 	# Prints error messages
 	def error(self, msg):
 		print("\n---\nERROR: " + msg)
+
+	#
+	# METRICS FUNCS
+	#
+
+	# Clears the recorded phases and counters
+	def resetMetrics(self):
+		self.metrics = {"fases": {}, "contadores": {}}
+		self.metricsStack = []
+
+	# Context manager that records the wall time and peak memory (above the memory in use when it starts) of a phase.
+	# Nested phases also count towards the peak of the enclosing ones, and a phase already being measured isn't measured twice
+	@contextlib.contextmanager
+	def measurePhase(self, name):
+		if not self.collectMetrics or any(entry[0] == name for entry in self.metricsStack):
+			yield
+			return
+		trace = self.metricsMemory
+		ownsTrace = trace and not tracemalloc.is_tracing()
+		current = 0
+		if ownsTrace:
+			tracemalloc.start()
+		elif trace:
+			current, peak = tracemalloc.get_traced_memory()
+			if len(self.metricsStack) > 0:
+				self.metricsStack[-1][2] = max(self.metricsStack[-1][2], peak)
+			tracemalloc.reset_peak()
+		entry = [name, current, 0]
+		self.metricsStack.append(entry)
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			elapsed = time.perf_counter() - start
+			self.metricsStack.remove(entry)
+			peak = None
+			if trace:
+				peak = max(entry[2], tracemalloc.get_traced_memory()[1])
+				if len(self.metricsStack) > 0:
+					self.metricsStack[-1][2] = max(self.metricsStack[-1][2], peak)
+				peak -= entry[1]
+			if ownsTrace:
+				tracemalloc.stop()
+			phase = self.metrics["fases"].setdefault(name, {"llamadas": 0, "segundos": 0.0, "memoriaPico": None})
+			phase["llamadas"] += 1
+			phase["segundos"] += elapsed
+			if peak is not None:
+				phase["memoriaPico"] = max(phase["memoriaPico"] or 0, peak)
+
+	# Adds n to a counter while collecting metrics
+	def countMetric(self, name, n=1):
+		if self.collectMetrics:
+			self.metrics["contadores"][name] = self.metrics["contadores"].get(name, 0) + n
+
+	# Passes through the combinations of a search, counting the ones emitted and, once it ends (or is closed),
+	# the section placements examined and the branches pruned by conflicts or by the prune func
+	def trackSearch(self, combs, stats):
+		emitted = 0
+		try:
+			for comb in combs:
+				emitted += 1
+				yield comb
+		finally:
+			self.countMetric("combinacionesExaminadas", stats[0])
+			self.countMetric("ramasPodadas", stats[0] - stats[1])
+			self.countMetric("horariosEmitidos", emitted)
+
+	# Gets a copy of the recorded metrics: per phase calls, seconds and peak memory in bytes (None if not traced), and counters
+	def getMetrics(self):
+		return {
+			"fases": {name : dict(phase) for name, phase in self.metrics["fases"].items()},
+			"contadores": dict(self.metrics["contadores"])
+		}
+
+	# Formats the recorded metrics in the Prometheus text exposition format
+	def metricsToPrometheus(self, prefix="schedule_assistant"):
+		metrics = self.getMetrics()
+		lines = []
+		for metric, key, kind in [("fase_llamadas_total", "llamadas", "counter"), ("fase_segundos_total", "segundos", "counter"), ("fase_memoria_pico_bytes", "memoriaPico", "gauge")]:
+			lines.append(f"# TYPE {prefix}_{metric} {kind}")
+			lines += [f'{prefix}_{metric}{{fase="{name}"}} {phase[key]}' for name, phase in metrics["fases"].items() if phase[key] is not None]
+		lines.append(f"# TYPE {prefix}_contador_total counter")
+		lines += [f'{prefix}_contador_total{{nombre="{name}"}} {value}' for name, value in metrics["contadores"].items()]
+		return "\n".join(lines) + "\n"
+
+	# Saves the recorded metrics as JSON, or as Prometheus text if the file name ends in .prom
+	def saveMetrics(self, fileName=""):
+		fileName = self.metricsName if fileName == "" else fileName
+		with open(fileName, "w") as file:
+			if fileName.endswith(".prom"):
+				file.write(self.metricsToPrometheus())
+			else:
+				json.dump(self.getMetrics(), file, indent=4)
+		return fileName
 	
 	#
 	# SAVE FILE FUNCS
@@ -163,11 +334,17 @@ class ScheduleAssistant:
 		if self.saveDataCSV:
 			data = self.coursesDataTable if len(data) == 0 else data
 			self.log("Guardando tabla (matriz) como CSV...")
-			with open(self.csvName, "w") as file:
-				writer = csv.writer(file)
-				for line in data:
-					if len(line) > 0:
-						writer.writerow(line)
+			for line in self.streamCSV(data):
+				pass
+
+	# Writes the rows of a stream into the CSV file as they pass through
+	def streamCSV(self, rows):
+		with open(self.csvName, "w") as file:
+			writer = csv.writer(file)
+			for line in rows:
+				if len(line) > 0:
+					writer.writerow(line)
+				yield line
 
 	# Saves a Python dictionary as a JSON file
 	def saveJSON(self, data={}):
@@ -175,7 +352,58 @@ class ScheduleAssistant:
 			data = self.coursesDataDict if len(data) == 0 else data
 			self.log("Guardando diccionario como JSON...")
 			with open(self.jsonName, "w") as file:
-				json.dump(self.coursesDataDict, file, indent=4, ensure_ascii=False)
+				json.dump(CompactRecord.plain(data), file, indent=4, ensure_ascii=False)
+
+	# Saves a courses dictionary in normalized courses / sections / sessions tables of a SQLite file, replacing its previous
+	# content in a single transaction
+	def saveSQLite(self, data={}):
+		if self.saveDataSQLite:
+			data = self.coursesDataDict if len(data) == 0 else data
+			self.log("Guardando diccionario en SQLite...")
+			courses, sections, sessions = [], [], []
+			for courseOrder, (code, courseData) in enumerate(data.items()):
+				courses.append((code, courseData["nombre"], courseData.get("malla"), courseOrder))
+				for secOrder, (sec, secData) in enumerate(courseData["secciones"].items()):
+					secId = len(sections) + 1
+					durs = {ses["duracion"] for ses in secData["sesiones"]}
+					sections.append((
+						secId, code, sec, secData["vacantes"], secData["matriculados"],
+						min([ses["hora"] for ses in secData["sesiones"]], default=24),
+						max([ses["hora"] + ses["duracion"] for ses in secData["sesiones"]], default=0),
+						durs.pop() if len(durs) == 1 else None, secOrder
+					))
+					sessions += [(
+						secId, sesOrder, ses["sesion"], ses["dia"], ses["hora"], ses["duracion"], ses["docente"], self.normalizeProf(ses["docente"])
+					) for sesOrder, ses in enumerate(secData["sesiones"])]
+			with contextlib.closing(self.openSQLite()) as db:
+				with db:
+					db.execute("DELETE FROM sesiones")
+					db.execute("DELETE FROM secciones")
+					db.execute("DELETE FROM cursos")
+					db.executemany("INSERT INTO cursos VALUES (?, ?, ?, ?)", courses)
+					db.executemany("INSERT INTO secciones VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", sections)
+					db.executemany("INSERT INTO sesiones VALUES (?, ?, ?, ?, ?, ?, ?, ?)", sessions)
+
+	# Saves the parsed table and dictionary of a pdf, keyed by its content hash, as a pickle
+	def saveParseCache(self, cache):
+		if self.useParseCache:
+			self.log("Guardando cache de la data del pdf...")
+			with open(self.cacheName + ".tmp", "wb") as file:
+				pickle.dump(cache, file, protocol=pickle.HIGHEST_PROTOCOL)
+			os.replace(self.cacheName + ".tmp", self.cacheName)
+
+	# Loads the parse cache if it was saved for a pdf with the same content hash by the current parser version
+	def loadParseCache(self, pdfHash):
+		if not self.useParseCache or not os.path.exists(self.cacheName):
+			return None
+		try:
+			with open(self.cacheName, "rb") as file:
+				cache = pickle.load(file)
+		except Exception:
+			return None
+		if type(cache) != dict or cache.get("version") != self.parseCacheVersion or cache.get("hash") != pdfHash:
+			return None
+		return cache
 
 	#
 	# WAIT FUNCS
@@ -193,26 +421,77 @@ class ScheduleAssistant:
 	
 	# Waits until a boolean lambda func becomes True
 	def waitUntilTrue(self, func, timeElapsed=0, interval=0.1):
-		if func():
-			return True
-		elif timeElapsed > self.timeout:
-			self.error("Timeout!")
-			return False
-		time.sleep(interval)
-		return self.waitUntilTrue(func, timeElapsed + interval)
+		deadline = time.monotonic() + self.timeout - timeElapsed
+		while not func():
+			if time.monotonic() > deadline:
+				self.error("Timeout!")
+				return False
+			time.sleep(interval)
+		return True
+
+	# Opens an inotify watch on a directory, returning its file descriptor (None if inotify isn't available)
+	def inotifyWatch(self, dirPath):
+		if platform.system() != "Linux":
+			return None
+		try:
+			libc = ctypes.CDLL(None, use_errno=True)
+			fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+			if fd < 0:
+				return None
+			if libc.inotify_add_watch(fd, os.fsencode(dirPath), self.inotifyEvents) < 0:
+				os.close(fd)
+				return None
+			return fd
+		except Exception:
+			return None
+
+	# Gets the (path, size) of the downloaded file in a directory, or None while there is none or a partial download remains
+	def getDownloadedFile(self, dirPath):
+		files = [entry for entry in os.scandir(dirPath) if entry.is_file()]
+		if any(entry.name.endswith(self.partialDownloadExts) for entry in files):
+			return None
+		files = [(entry.path, entry.stat().st_size) for entry in files]
+		return next((i for i in sorted(files) if i[1] > 0), None)
+
+	# Waits until a download in a directory completes (no partial file remains and its size stopped changing), returning its path.
+	# Wakes up on filesystem events when inotify is available, polling otherwise
+	def waitForDownload(self, dirPath, interval=0.1):
+		deadline = time.monotonic() + self.timeout
+		fd = self.inotifyWatch(dirPath)
+		try:
+			last = None
+			while True:
+				found = self.getDownloadedFile(dirPath)
+				if found is not None and found == last:
+					return found[0]
+				last = found
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					self.error("Timeout!")
+					return None
+				wait = min(self.downloadSettleTime if found is not None else interval, remaining)
+				if fd is None:
+					time.sleep(wait)
+				elif select.select([fd], [], [], wait if found is not None else remaining)[0]:
+					while select.select([fd], [], [], 0)[0]:
+						os.read(fd, 65536)
+					last = None
+		finally:
+			if fd is not None:
+				os.close(fd)
 
 	#
 	# WEB SCRAPER FUNCS
 	#
 	
-	# Logs in the user
-	def login(self, email="", passw=""):
+	# Logs in the user, unless the browser is already authenticated (checkSession=False skips that check when the caller already did it)
+	@measuredPhase("login")
+	def login(self, email="", passw="", checkSession=True):
 		email = self.email if email == "" else email
 		passw = self.passw if passw == "" else passw
 
 		self.log("Iniciando sesion...")
-		self.br.get(self.sisURL)
-		if self.loginPage not in self.br.current_url:
+		if checkSession and self.hasSession():
 			return True
 		self.br.find_element_by_tag_name("button").click()
 
@@ -228,18 +507,63 @@ class ScheduleAssistant:
 
 		if not self.waitForPageLoad("profileIdentifier"):
 			return False
-		time.sleep(1)
-
-		form = self.br.find_element_by_tag_name("form")
-		field = [i for i in form.find_elements_by_tag_name("input") if i.get_attribute("type") == "password"][0]
+		try:
+			passwordVisible = EC.element_to_be_clickable((By.CSS_SELECTOR, "form input[type='password']"))
+			field = WebDriverWait(self.br, self.timeout).until(passwordVisible)
+		except TimeoutException:
+			self.error("Timeout!")
+			return False
 		field.send_keys(passw)
 
 		buttons = self.br.find_elements_by_tag_name("button")
 		btn = [i for i in buttons if len(i.find_elements_by_tag_name("span")) == 1][0]
 		btn.click()
+
+		if self.persistSession:
+			try:
+				WebDriverWait(self.br, self.timeout).until(lambda br : br.current_url.startswith(self.sisURL) and self.loginPage not in br.current_url)
+			except TimeoutException:
+				self.error("Timeout!")
+				return False
+			self.saveCookies()
 		return True
 
+	# Checks if the browser is already authenticated, from its persistent profile or the saved session cookies
+	def hasSession(self):
+		self.br.get(self.sisURL)
+		if self.loginPage in self.br.current_url and self.loadCookies():
+			self.br.get(self.sisURL)
+		return self.loginPage not in self.br.current_url
+
+	# Saves the cookies of the authenticated session so later runs can skip the login
+	def saveCookies(self):
+		self.log("Guardando sesion...")
+		with open(os.open(self.cookiesName, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as file:
+			os.chmod(self.cookiesName, 0o600)
+			json.dump(self.br.get_cookies(), file)
+
+	# Adds the saved (and not expired) session cookies to the browser, returning True if any was added
+	def loadCookies(self):
+		if not self.persistSession or not os.path.exists(self.cookiesName):
+			return False
+		try:
+			with open(self.cookiesName, "r") as file:
+				cookies = json.load(file)
+		except Exception:
+			return False
+		added = 0
+		for cookie in cookies:
+			if cookie.get("expiry", math.inf) <= time.time():
+				continue
+			try:
+				self.br.add_cookie(cookie)
+				added += 1
+			except Exception:
+				continue
+		return added > 0
+
 	# Navigates to enabled courses download page and downloads the courses pdf
+	@measuredPhase("descarga")
 	def downloadScheduleData(self):
 		self.log("Navegando a pagina de descarga de cursos disponibles...")
 		self.br.get(self.sisURL + self.downloadPage)
@@ -250,6 +574,10 @@ class ScheduleAssistant:
 
 		homeWindow = self.br.window_handles[0]
 
+		os.makedirs(self.downDir, exist_ok=True)
+		for fname in os.listdir(self.downDir):
+			os.remove(os.path.join(self.downDir, fname))
+
 		self.log("Descargando cursos disponibles...")
 		btn.click()
 
@@ -257,108 +585,627 @@ class ScheduleAssistant:
 
 		dtChecked = datetime.now()
 
-		if not self.waitUntilTrue(lambda : os.path.exists(".down")):
+		fname = self.waitForDownload(self.downDir)
+		if fname is None:
 			return False
 
-		if not self.waitUntilTrue(lambda : len(list(os.walk(".down"))[0][2]) > 0):
-			return False
-		
-		time.sleep(1)
-
-		fname = os.path.join(self.downDir, list(os.walk(".down"))[0][2][0])
+		os.replace(fname, self.pdfName)
 
-		if not self.waitUntilTrue(lambda : os.path.exists(fname)):
-			return False
-
-		if not self.waitUntilTrue(lambda : os.stat(fname).st_size > 0):
-			return False
-		
-		os.rename(fname, self.pdfName)
-
-		if not self.waitUntilTrue(lambda : len(list(os.walk(self.downDir))[0][2]) == 0):
+		if not self.waitUntilTrue(lambda : len(os.listdir(self.downDir)) == 0):
 			return False
 
 		os.rmdir(self.downDir)
 
 		popup = [win for win in self.br.window_handles if win != homeWindow][0]
 		self.br.switch_to.window(popup)
+		if self.br.current_url.startswith("http"):
+			self.saveFetchState({**self.loadFetchState(), "reportURL": self.br.current_url})
 		self.br.close()
 		self.br.switch_to.window(self.br.window_handles[0])
+		if self.persistSession:
+			self.saveCookies()
+		return dtChecked
+
+	#
+	# HTTP FETCH FUNCS
+	#
+
+	# Saves the report URL and the validators (ETag / Last-Modified) of the last fetched pdf
+	def saveFetchState(self, state):
+		with open(self.fetchStateName, "w") as file:
+			json.dump(state, file)
+
+	# Loads the report URL and validators of the last fetched pdf
+	def loadFetchState(self):
+		if not os.path.exists(self.fetchStateName):
+			return {}
+		try:
+			with open(self.fetchStateName, "r") as file:
+				return json.load(file)
+		except Exception:
+			return {}
+
+	# Gets a kept-alive connection to the host of a parsed URL, reusing it between requests
+	def getHttpConnection(self, url, fresh=False):
+		key = (url.scheme, url.netloc)
+		if fresh and key in self.httpConnections:
+			self.httpConnections.pop(key).close()
+		if key not in self.httpConnections:
+			connClass = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+			self.httpConnections[key] = connClass(url.netloc, timeout=self.timeout)
+		return self.httpConnections[key]
+
+	# Sends a GET request on a pooled connection, reconnecting once if the kept-alive connection was closed by the server
+	def httpGet(self, url, headers):
+		url = urllib.parse.urlsplit(url)
+		path = (url.path or "/") + (f"?{url.query}" if url.query else "")
+		for fresh in [False, True]:
+			conn = self.getHttpConnection(url, fresh)
+			try:
+				conn.request("GET", path, headers=headers)
+				return conn.getresponse()
+			except (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionError):
+				if fresh:
+					raise
+
+	# Checks if a saved browser cookie must be sent to a parsed URL: same host or a subdomain of the cookie domain,
+	# a path under the cookie path and, for secure cookies, only over https
+	@staticmethod
+	def cookieMatches(cookie, url):
+		host = (url.hostname or "").lower()
+		domain = cookie.get("domain", host).lower().lstrip(".")
+		if host != domain and not host.endswith("." + domain):
+			return False
+		if cookie.get("secure", False) and url.scheme != "https":
+			return False
+		path = cookie.get("path", "/") or "/"
+		urlPath = url.path or "/"
+		return urlPath == path or urlPath.startswith(path if path.endswith("/") else path + "/")
+
+	# Downloads the courses pdf over plain HTTP with the saved session cookies, without a browser, writing it atomically to pdfName.
+	# Uses a conditional request when the pdf was fetched before, returning the check time (False on error or expired session)
+	@measuredPhase("descarga")
+	def fetchScheduleData(self, url=""):
+		state = self.loadFetchState()
+		url = url or self.reportURL or state.get("reportURL", "")
+		if url == "":
+			self.error("URL del pdf de horarios desconocida. Descargue el pdf una vez con el browser")
+			return False
+		try:
+			with open(self.cookiesName, "r") as file:
+				cookies = json.load(file)
+		except Exception:
+			cookies = []
+
+		self.log("Descargando cursos disponibles...")
+		dtChecked = datetime.now()
+		reportURL = url
+		for redirects in range(5):
+			headers = {"Accept": "application/pdf", "Connection": "keep-alive"}
+			cookie = "; ".join(f"{c['name']}={c['value']}" for c in cookies if self.cookieMatches(c, urllib.parse.urlsplit(url)))
+			if cookie != "":
+				headers["Cookie"] = cookie
+			if os.path.exists(self.pdfName) and state.get("url") == url:
+				if "etag" in state:
+					headers["If-None-Match"] = state["etag"]
+				if "lastModified" in state:
+					headers["If-Modified-Since"] = state["lastModified"]
+			try:
+				resp = self.httpGet(url, headers)
+			except Exception as e:
+				print(e)
+				self.error(f"No se pudo descargar el pdf de horarios de {url}")
+				return False
+			if resp.status in (301, 302, 303, 307, 308) and self.loginPage not in resp.getheader("Location", self.loginPage):
+				resp.read()
+				url = urllib.parse.urljoin(url, resp.getheader("Location"))
+				continue
+			break
+
+		if resp.status == 304:
+			resp.read()
+			return dtChecked
+		if resp.status != 200:
+			resp.read()
+			self.error(f"La sesion expiro o no es valida (HTTP {resp.status}). Inicie sesion con el browser")
+			return False
+
+		tmpName = self.pdfName + ".tmp"
+		try:
+			with open(tmpName, "wb") as file:
+				chunk = resp.read(65536)
+				if not chunk.startswith(b"%PDF"):
+					file.close()
+					os.remove(tmpName)
+					resp.read()
+					self.error("La respuesta no es un pdf. Es posible que la sesion haya expirado, inicie sesion con el browser")
+					return False
+				size = 0
+				while chunk:
+					file.write(chunk)
+					size += len(chunk)
+					chunk = resp.read(65536)
+			if resp.getheader("Content-Length", str(size)) != str(size):
+				raise http.client.IncompleteRead(b"", int(resp.getheader("Content-Length")) - size)
+		except Exception as e:
+			print(e)
+			if os.path.exists(tmpName):
+				os.remove(tmpName)
+			self.getHttpConnection(urllib.parse.urlsplit(url), True)
+			self.error(f"Se interrumpio la descarga del pdf de horarios de {url}")
+			return False
+		os.replace(tmpName, self.pdfName)
+
+		state = {"reportURL": reportURL, "url": url}
+		for key, header in [("etag", "ETag"), ("lastModified", "Last-Modified")]:
+			if resp.getheader(header) is not None:
+				state[key] = resp.getheader(header)
+		self.saveFetchState(state)
 		return dtChecked
 
 	#
 	# DATA PARSER FUNCS
 	#
 	
-	# Scrapes the courses' schedules pdf and parses into a Python matrix
-	def pdfToTable(self):
+	# Hashes the courses' schedules pdf and loads its parse cache, returning the pdf content and hash (None if it doesn't exist)
+	def hashPdf(self):
 		if not os.path.exists(self.pdfName):
 			self.error(f"El pdf de horarios con nombre {self.pdfName} no existe")
-			return 0
-
+			return None, None
+		with open(self.pdfName, "rb") as file:
+			content = file.read()
+		pdfHash = hashlib.sha256(content).hexdigest()
+		self.parseCache = self.loadParseCache(pdfHash)
+		return content, pdfHash
+
+	# Reads the tables of the courses' schedules pdf, returning None if they can't be read
+	@measuredPhase("extraccionPdf")
+	def readPdf(self, content):
 		self.log("Leyendo tablas del pdf...")
 		try:
-			tables = read_pdf(self.pdfName, pages="all")
+			return self.readPdfTables(content)
 		except Exception as e:
 			print(e)
 			self.error(f"No se pudo leer tablas del pdf {self.pdfName}. Posiblemente el formato sea el incorrecto")
+			return None
+
+	# Scrapes the courses' schedules pdf and parses into a Python matrix
+	def pdfToTable(self):
+		content, pdfHash = self.hashPdf()
+		if content is None:
+			return 0
+
+		if self.parseCache is not None and self.parseCache["table"] is not None:
+			self.log("Cargando tabla del pdf desde cache...")
+			self.coursesDataTable = self.parseCache["table"]
+			self.saveCSV()
+			return self.coursesDataTable
+
+		tables = self.readPdf(content)
+		if tables is None:
+			return 0
 
 		self.log("Parse-ando tabla de pdf a matriz de Python...")
-		formatCell = lambda cell : " ".join(cell.replace("\r", " ").replace("\n", " ").split(", ")[::-1]) if type(cell) == str else ("" if math.isnan(cell) else int(cell))
-		self.coursesDataTable = list(itertools.chain(*[
-			[tuple(formatCell(i) for i in table.columns)]
-			+
-			list(zip(*[[formatCell(i) for i in table[col].to_list()] for col in table]))
-			for table in tables
-		]))
+		self.coursesDataTable = list(self.iterTableRows(tables))
+		self.parseCache = {"version": self.parseCacheVersion, "hash": pdfHash, "table": self.coursesDataTable, "dict": None}
 
 		self.saveCSV()
 		return self.coursesDataTable
 
-	# Parses the schedule data table into a Python dictionary
-	def tableToDict(self):
-		self.log("Parse-ando matriz a diccionario de cursos...")
-		keys = ("cod", "nom", "prof", "malla", "tipo", "mod", "sec", "ses", "hora", "sem", "ubic", "vac", "mat")
-		mat = [dict(zip(keys, i)) for i in self.coursesDataTable[1:]]
+	# Streams the rows of the courses' schedules pdf page by page into the courses dictionary, without building the full matrix.
+	# The CSV is written as a side output of the same stream and the JSON once the dictionary is complete
+	def pdfToDict(self):
+		content, pdfHash = self.hashPdf()
+		if content is None:
+			return 0
 
-		self.coursesDataDict = {}
+		if self.parseCache is not None and self.parseCache["dict"] is not None:
+			self.log("Cargando diccionario de cursos desde cache...")
+			if self.parseCache["table"] is not None:
+				self.coursesDataTable = self.parseCache["table"]
+				self.saveCSV()
+			self.setCoursesData(self.parseCache["dict"])
+			self.catalogHash = pdfHash
+			self.saveJSON()
+			self.saveSQLite()
+			return self.coursesDataDict
+
+		data = self.streamPdf(content)
+		if data is None:
+			return 0
+		self.setCoursesData(data)
+		self.catalogHash = pdfHash
 
-		blacklist = []
-		for i in mat:
-			if i["sem"] != "Semana General" or i["cod"] in blacklist:
-				blacklist.append(i["cod"])
+		self.parseCache = {"version": self.parseCacheVersion, "hash": pdfHash, "table": None, "dict": self.coursesDataDict}
+		self.saveParseCache(self.parseCache)
+
+		self.saveJSON()
+		self.saveSQLite()
+		return self.coursesDataDict
+
+	# Streams the rows of the pdf tables into a new courses dictionary, writing the CSV as a side output
+	def streamPdf(self, content):
+		tables = self.readPdf(content)
+		if tables is None:
+			return None
+		rows = self.iterTableRows(tables)
+		if self.saveDataCSV:
+			self.log("Guardando tabla (matriz) como CSV...")
+			rows = self.streamCSV(rows)
+		return self.rowsToDict(rows)
+
+	# Re-reads the pdf and applies to the loaded courses dictionary only what changed, returning the delta (None on error).
+	# The JSON and the parse cache are only rewritten if something changed
+	def refreshCatalog(self):
+		content, pdfHash = self.hashPdf()
+		if content is None:
+			return None
+		if pdfHash == self.catalogHash:
+			return self.diffCatalogs(self.coursesDataDict, self.coursesDataDict)
+
+		self.log("Actualizando diccionario de cursos...")
+		data = self.parseCache["dict"] if self.parseCache is not None and self.parseCache["dict"] is not None else self.streamPdf(content)
+		if data is None:
+			return None
+		data = self.compactCourses(data)
+
+		delta = self.diffCatalogs(self.coursesDataDict, data)
+		self.applyDelta(delta, list(data.keys()))
+		self.catalogHash = pdfHash
+		if self.isDeltaEmpty(delta):
+			return delta
+
+		self.parseCache = {"version": self.parseCacheVersion, "hash": pdfHash, "table": None, "dict": self.coursesDataDict}
+		self.saveParseCache(self.parseCache)
+		self.saveJSON()
+		self.saveSQLite()
+		return delta
+
+	# Counts the page objects of a pdf, returning 0 if they can't be found (e.g. when they are inside compressed object streams)
+	def countPdfPages(self, content):
+		return len(re.findall(rb"/Type\s*/Page(?![A-Za-z])", content))
+
+	# Reads the tables of a range of pages of a pdf (run in a worker process by readPdfTables)
+	@staticmethod
+	def readPdfPages(pdfName, pages):
+		return read_pdf(pdfName, pages=pages)
+
+	# Reads every table of the pdf, splitting its pages in contiguous ranges read by pdfWorkers processes and stitched back in page order.
+	# The page count is a guess (pdfs with incremental updates keep old page objects), so if a range can't be read the whole pdf is read at once
+	def readPdfTables(self, content):
+		pages = self.countPdfPages(content) if self.pdfWorkers > 1 else 0
+		if pages < 2:
+			return read_pdf(self.pdfName, pages="all")
+		size = math.ceil(pages / min(self.pdfWorkers, pages))
+		ranges = [f"{i}-{min(i + size - 1, pages)}" for i in range(1, pages + 1, size)]
+		try:
+			with concurrent.futures.ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+				return list(itertools.chain(*executor.map(self.readPdfPages, [self.pdfName] * len(ranges), ranges)))
+		except Exception:
+			return read_pdf(self.pdfName, pages="all")
+
+	# Formats the cells of the pdf tables and yields them as rows, table by table, each one starting with its header row
+	def iterTableRows(self, tables):
+		formatCell = lambda cell : " ".join(cell.replace("\r", " ").replace("\n", " ").split(", ")[::-1]) if type(cell) == str else ("" if math.isnan(cell) else int(cell))
+		for table in tables:
+			yield tuple(formatCell(i) for i in table.columns)
+			for row in table.itertuples(index=False, name=None):
+				yield tuple(formatCell(i) for i in row)
+
+	# Parses a stream of schedule data rows (the first one being the header) into the courses dictionary
+	@measuredPhase("tablaADict")
+	def rowsToDict(self, rows):
+		self.log("Parse-ando matriz a diccionario de cursos...")
+		data = {}
+
+		rows = iter(rows)
+		next(rows, None)
+		blacklist = set()
+		hours = {}
+		parsed = 0
+		for parsed, row in enumerate(rows, 1):
+			if len(row) < 13:
 				continue
-			if i["cod"] not in self.coursesDataDict:
-				self.coursesDataDict[i["cod"]] = {
-					"nombre": i["nom"],
-					"malla": i["malla"],
+			cod, nom, prof, malla, tipo, mod, sec, ses, hora, sem, ubic, vac, mat = row[:13]
+			if sem != "Semana General" or cod in blacklist:
+				blacklist.add(cod)
+				continue
+			if cod not in data:
+				data[cod] = {
+					"nombre": nom,
+					"malla": malla,
 					"secciones": {}
 				}
-			if str(i["sec"]) not in self.coursesDataDict[i["cod"]]["secciones"]:
-				self.coursesDataDict[i["cod"]]["secciones"][str(i["sec"])] = {
-					"vacantes": int("0" + str(i["vac"])),
-					"matriculados": int("0" + str(i["mat"])),
+			secciones = data[cod]["secciones"]
+			sec = str(sec)
+			if sec not in secciones:
+				secciones[sec] = {
+					"vacantes": vac or 0,
+					"matriculados": mat or 0,
 					"sesiones": []
 				}
-			dia, hora = i["hora"].replace(" ", "").split(".")
-			horaIn, horaFin = hora.split("-")
-			self.coursesDataDict[i["cod"]]["secciones"][str(i["sec"])]["sesiones"].append({
-				"sesion" : i["ses"],
-				"dia" : self.dias.index(dia.lower()),
-				"hora" : int(horaIn.split(":")[0]),
-				"duracion" : int(horaFin.split(":")[0]) - int(horaIn.split(":")[0]),
-				"docente" : i["prof"]
+			if hora not in hours:
+				dia, horaRange = hora.replace(" ", "").split(".")
+				horaIn, horaFin = [int(i.split(":")[0]) for i in horaRange.split("-")]
+				hours[hora] = (self.dias.index(dia.lower()), horaIn, horaFin - horaIn)
+			dia, horaIn, dur = hours[hora]
+			secciones[sec]["sesiones"].append({
+				"sesion" : ses,
+				"dia" : dia,
+				"hora" : horaIn,
+				"duracion" : dur,
+				"docente" : prof
 			})
-		
+
 		self.log("Ordenando diccionario de cursos...")
-		for courseData in self.coursesDataDict.values():
+		for courseData in data.values():
 			for secData in courseData["secciones"].values():
-				secData["sesiones"] = sorted(secData["sesiones"], key=lambda i : (i["dia"], i["hora"], i["duracion"]))
+				secData["sesiones"].sort(key=lambda i : (i["dia"], i["hora"], i["duracion"]))
 			courseData["secciones"] = {str(sec) : courseData["secciones"][sec] for sec in sorted(courseData["secciones"])}
+		self.countMetric("filasLeidas", parsed)
+		return data
 
+	# Streams the rows of the CSV file, converting back to int the cells that formatCell read as numbers (a numeric malla,
+	# the section and the seats), so the rows are the same as the ones of the pdf. Empty seats stay "" as with formatCell.
+	# Those cells repeat a lot, so each distinct one is converted once
+	def iterCSVRows(self):
+		convert = functools.lru_cache(maxsize=None)(lambda cell : int(cell) if cell.isdigit() else cell)
+		with open(self.csvName, "r", newline="") as file:
+			for row in csv.reader(file):
+				if len(row) >= 13:
+					row[3], row[6], row[11], row[12] = convert(row[3]), convert(row[6]), convert(row[11]), convert(row[12])
+				yield row
+
+	# Loads the courses dictionary streaming the rows of the CSV file, without building the full matrix
+	def loadCSV(self):
+		if not os.path.exists(self.csvName):
+			self.error(f"El CSV de horarios con nombre {self.csvName} no existe")
+			return 0
+		self.log("Leyendo CSV de horarios...")
+		self.setCoursesData(self.rowsToDict(self.iterCSVRows()))
 		self.saveJSON()
+		self.saveSQLite()
 		return self.coursesDataDict
 
+	# Loads the courses dictionary from the JSON file
+	def loadJSON(self):
+		with open(self.jsonName, "r") as file:
+			try:
+				return self.setCoursesData(json.load(file))
+			except Exception as e:
+				print(e)
+				self.error(f"No se pudo leer archivo JSON {self.jsonName}")
+				return False
+
+	# Parses the schedule data table into a Python dictionary
+	def tableToDict(self):
+		cache = self.parseCache if self.parseCache is not None and self.parseCache["table"] is self.coursesDataTable else None
+		if cache is not None and cache["dict"] is not None:
+			self.log("Cargando diccionario de cursos desde cache...")
+			self.setCoursesData(cache["dict"])
+			self.saveJSON()
+			self.saveSQLite()
+			return self.coursesDataDict
+
+		self.setCoursesData(self.rowsToDict(self.coursesDataTable))
+
+		if cache is not None:
+			cache["dict"] = self.coursesDataDict
+			self.saveParseCache(cache)
+
+		self.saveJSON()
+		self.saveSQLite()
+		return self.coursesDataDict
+
+	#
+	# CATALOG DELTA FUNCS
+	#
+
+	# Compares two courses dictionaries, returning the added and removed courses and, for every other course that changed,
+	# its new name/malla and its added and removed sections, changed seat counts and changed sessions
+	def diffCatalogs(self, old, new):
+		delta = {
+			"agregados": {code : new[code] for code in new if code not in old},
+			"eliminados": [code for code in old if code not in new],
+			"modificados": {}
+		}
+		for code in new:
+			if code not in old or old[code] is new[code]:
+				continue
+			oldSecs, newSecs = old[code]["secciones"], new[code]["secciones"]
+			changes = {key : new[code][key] for key in ["nombre", "malla"] if old[code].get(key) != new[code].get(key)}
+			changes["seccionesAgregadas"] = {sec : newSecs[sec] for sec in newSecs if sec not in oldSecs}
+			changes["seccionesEliminadas"] = [sec for sec in oldSecs if sec not in newSecs]
+			changes["vacantes"] = {
+				sec : {"antes": [oldSecs[sec]["vacantes"], oldSecs[sec]["matriculados"]], "ahora": [newSecs[sec]["vacantes"], newSecs[sec]["matriculados"]]}
+				for sec in newSecs if sec in oldSecs
+				and (oldSecs[sec]["vacantes"], oldSecs[sec]["matriculados"]) != (newSecs[sec]["vacantes"], newSecs[sec]["matriculados"])
+			}
+			changes["sesiones"] = {sec : newSecs[sec]["sesiones"] for sec in newSecs if sec in oldSecs and oldSecs[sec]["sesiones"] != newSecs[sec]["sesiones"]}
+			changes = {key : value for key, value in changes.items() if len(value) > 0}
+			if len(changes) > 0:
+				delta["modificados"][code] = changes
+		return delta
+
+	# Checks if a delta has no changes
+	def isDeltaEmpty(self, delta):
+		return not any(delta.values())
+
+	# Applies a delta in place to the loaded courses dictionary (keeping the course order of the new data, if given),
+	# invalidating the cached data of the changed courses only
+	def applyDelta(self, delta, order=None):
+		for code in delta["eliminados"]:
+			del self.coursesDataDict[code]
+		self.coursesDataDict.update(self.compactCourses(delta["agregados"]))
+
+		for code, changes in delta["modificados"].items():
+			courseData = self.coursesDataDict[code]
+			courseData.update({key : changes[key] for key in ["nombre", "malla"] if key in changes})
+			secs = courseData["secciones"]
+			for sec in changes.get("seccionesEliminadas", []):
+				del secs[sec]
+			for sec, seats in changes.get("vacantes", {}).items():
+				secs[sec]["vacantes"], secs[sec]["matriculados"] = seats["ahora"]
+			for sec, sessions in changes.get("sesiones", {}).items():
+				secs[sec]["sesiones"] = sessions
+			if "seccionesAgregadas" in changes:
+				secs.update(Course.compactValue("secciones", changes["seccionesAgregadas"]) if self.useCompactModel else changes["seccionesAgregadas"])
+				courseData["secciones"] = {sec : secs[sec] for sec in sorted(secs)}
+
+		if order is not None and (len(delta["agregados"]) > 0 or len(delta["eliminados"]) > 0):
+			self.coursesDataDict = {code : self.coursesDataDict[code] for code in order}
+
+		self.invalidateCourses(list(delta["agregados"]) + delta["eliminados"] + list(delta["modificados"]))
+		return self.coursesDataDict
+
+	# Drops the cached data derived from the given courses, re-indexing them if the indexes were built
+	def invalidateCourses(self, codes):
+		codes = set(codes)
+		self.sectionMasks = {key : mask for key, mask in self.sectionMasks.items() if key[0] not in codes}
+		if self.indexes is not None:
+			for code in codes:
+				self.unindexCourse(code)
+				if code in self.coursesDataDict:
+					self.indexCourse(code)
+			self.indexes["cursos"] = {code : i for i, code in enumerate(self.coursesDataDict)}
+
+	# Converts the courses of a dictionary to Course records (see useCompactModel), leaving the ones already converted as they are
+	def compactCourses(self, data):
+		if not self.useCompactModel:
+			return data
+		return {sys.intern(code) : Course.fromMapping(courseData) for code, courseData in data.items()}
+
+	# Replaces the loaded courses dictionary, dropping every cache derived from the previous one
+	def setCoursesData(self, data):
+		self.coursesDataDict = self.compactCourses(data)
+		self.sectionMasks = {}
+		self.indexes = None
+		return self.coursesDataDict
+
+	#
+	# SQLITE FUNCS
+	#
+
+	# Opens the SQLite file, creating its tables and indexes if they don't exist, or only for reading with readOnly (without
+	# creating the file). Sections keep the earliest start, latest end and shared duration of their sessions (as the indexes of
+	# buildIndexes) so the time filters are indexed lookups
+	def openSQLite(self, readOnly=False):
+		if readOnly:
+			return sqlite3.connect(f"file:{urllib.request.pathname2url(os.path.abspath(self.sqliteName))}?mode=ro", uri=True)
+		db = sqlite3.connect(self.sqliteName)
+		db.executescript("""
+			CREATE TABLE IF NOT EXISTS cursos (codigo TEXT PRIMARY KEY, nombre TEXT, malla TEXT, orden INTEGER);
+			CREATE TABLE IF NOT EXISTS secciones (
+				id INTEGER PRIMARY KEY, codigo TEXT REFERENCES cursos(codigo), seccion TEXT, vacantes INTEGER, matriculados INTEGER,
+				inicio INTEGER, fin INTEGER, duracion INTEGER, orden INTEGER, UNIQUE (codigo, seccion)
+			);
+			CREATE TABLE IF NOT EXISTS sesiones (
+				seccion INTEGER REFERENCES secciones(id), orden INTEGER, sesion TEXT, dia INTEGER, hora INTEGER, duracion INTEGER,
+				docente TEXT, docenteNorm TEXT
+			);
+			CREATE INDEX IF NOT EXISTS seccionesInicio ON secciones (inicio);
+			CREATE INDEX IF NOT EXISTS seccionesFin ON secciones (fin);
+			CREATE INDEX IF NOT EXISTS seccionesDuracion ON secciones (duracion);
+			CREATE INDEX IF NOT EXISTS sesionesSeccion ON sesiones (seccion, orden);
+			CREATE INDEX IF NOT EXISTS sesionesDocente ON sesiones (docenteNorm);
+			CREATE INDEX IF NOT EXISTS sesionesDiaHora ON sesiones (dia, hora);
+		""")
+		return db
+
+	# Reads the sections matched by a where clause over secciones (aliased s) into a courses dictionary (as the filterBy funcs,
+	# or with malla too if full), in the order they were saved
+	def querySQLite(self, db, where="1", params=(), full=False):
+		rows = db.execute(f"""
+			SELECT c.codigo, c.nombre, c.malla, s.seccion, s.vacantes, s.matriculados, e.sesion, e.dia, e.hora, e.duracion, e.docente
+			FROM secciones s JOIN cursos c ON c.codigo = s.codigo LEFT JOIN sesiones e ON e.seccion = s.id
+			WHERE {where} ORDER BY c.orden, s.orden, e.orden
+		""", params)
+		data = {}
+		for code, nom, malla, sec, vac, mat, ses, dia, hora, dur, prof in rows:
+			if code not in data:
+				data[code] = {"nombre": nom, "malla": malla, "secciones": {}} if full else {"nombre": nom, "secciones": {}}
+			secciones = data[code]["secciones"]
+			if sec not in secciones:
+				secciones[sec] = {"vacantes": vac, "matriculados": mat, "sesiones": []}
+			if ses is not None:
+				secciones[sec]["sesiones"].append({"sesion": ses, "dia": dia, "hora": hora, "duracion": dur, "docente": prof})
+		return data
+
+	# Loads the courses dictionary from the SQLite file
+	def loadSQLite(self):
+		if not os.path.exists(self.sqliteName):
+			self.error(f"La base de datos SQLite con nombre {self.sqliteName} no existe")
+			return 0
+		self.log("Leyendo base de datos SQLite...")
+		with contextlib.closing(self.openSQLite(True)) as db:
+			data = self.querySQLite(db, full=True)
+			data.update({code : {"nombre": nom, "malla": malla, "secciones": {}} for code, nom, malla in db.execute(
+				"SELECT codigo, nombre, malla FROM cursos WHERE codigo NOT IN (SELECT codigo FROM secciones) ORDER BY orden"
+			) if code not in data})
+		return self.setCoursesData(data)
+
+	# Looks up a course in the SQLite file without loading the rest of the catalog, returning None if it doesn't exist
+	def getCourseSQLite(self, code):
+		if not os.path.exists(self.sqliteName):
+			self.error(f"La base de datos SQLite con nombre {self.sqliteName} no existe")
+			return None
+		with contextlib.closing(self.openSQLite(True)) as db:
+			course = db.execute("SELECT nombre, malla FROM cursos WHERE codigo = ?", (code,)).fetchone()
+			if course is None:
+				return None
+			data = self.querySQLite(db, "s.codigo = ?", (code,), True)
+		return data.get(code, {"nombre": course[0], "malla": course[1], "secciones": {}})
+
+	# Filters the sections in the SQLite file with indexed queries, returning a courses dictionary as the filterBy funcs.
+	# The filters combine as CourseQuery: courses in codes, with a session taught by any of the comma separated professors
+	# (matched against the distinct professors of the index), all sessions between minBegTime and maxEndTime, and lasting durTime
+	def filterSQLite(self, codes=None, prof="", minBegTime=0, maxEndTime=24, durTime=None):
+		if not os.path.exists(self.sqliteName):
+			self.error(f"La base de datos SQLite con nombre {self.sqliteName} no existe")
+			return {}
+		where, params = ["s.inicio >= ?", "s.fin <= ?"], [minBegTime, maxEndTime]
+		with contextlib.closing(self.openSQLite(True)) as db:
+			if codes is not None:
+				where.append(f"s.codigo IN ({', '.join('?' * len(codes))})")
+				params += list(codes)
+			if durTime is not None:
+				where.append("s.duracion = ?")
+				params.append(durTime)
+			queries = [q for q in prof.replace(" ", "").lower().split(",") if q != ""]
+			if len(queries) > 0:
+				profs = [i for (i,) in db.execute("SELECT DISTINCT docenteNorm FROM sesiones") if any(q in i for q in queries)]
+				where.append(f"s.id IN (SELECT seccion FROM sesiones WHERE docenteNorm IN ({', '.join('?' * len(profs))}))")
+				params += profs
+			return self.querySQLite(db, " AND ".join(where), params)
+
+	#
+	# OCCUPANCY MASK FUNCS
+	#
+
+	# Packs the sessions of a section into a 168-bit mask (one bit per day-hour), or None if they conflict with each other
+	def sessionsToMask(self, sessions):
+		mask = 0
+		for ses in sessions:
+			sesMask = ((1 << ses["duracion"]) - 1) << (ses["dia"] * 24 + ses["hora"])
+			if mask & sesMask:
+				return None
+			mask |= sesMask
+		return mask
+
+	# Gets the (cached) occupancy mask of a section
+	def getSectionMask(self, cod, sec):
+		if (cod, sec) not in self.sectionMasks:
+			self.sectionMasks[(cod, sec)] = self.sessionsToMask(self.coursesDataDict[cod]["secciones"][sec]["sesiones"])
+		return self.sectionMasks[(cod, sec)]
+
+	# Precompiles the occupancy mask of every section in the courses dictionary
+	def compileSectionMasks(self):
+		self.sectionMasks = {
+			(cod, sec) : self.sessionsToMask(secData["sesiones"])
+			for cod, courseData in self.coursesDataDict.items() for sec, secData in courseData["secciones"].items()
+		}
+		return self.sectionMasks
+
 	#
 	# VALIDATION FUNCS
 	#
@@ -366,15 +1213,18 @@ class ScheduleAssistant:
 	# Validates that the sessions in each section of a course don't conflict
 	def validateCourse(self, cod):
 		valid = True
-		for secNum, sec in self.coursesDataDict[cod]["secciones"].items():
-			if self.mergeClassesIntoWeekIfPossible([[i] for i in sec["sesiones"]]) == []:
+		for secNum in self.coursesDataDict[cod]["secciones"]:
+			if self.getSectionMask(cod, secNum) is None:
 				self.error(f"Conflicto de horarios encontrado entre las sesiones de la seccion {secNum} del curso {cod}")
 				valid = False
 		return valid
 
 	# Checks that every extracted course is valid
+	@measuredPhase("validacion")
 	def validateCoursesData(self):
 		self.log("Validando la data de horarios de cursos disponibles...")
+		self.compileSectionMasks()
+		self.buildIndexes()
 		return sum([int(not self.validateCourse(c)) for c in self.coursesDataDict]) == 0
 	
 	#
@@ -423,22 +1273,405 @@ class ScheduleAssistant:
 			[self.addCourseInfoToSessions(code, sec) for sec in data[code]["secciones"]] for code in data
 		]))
 
+	# Builds the week matrix of a compact schedule (a combination of (course code, section) pairs) on demand
+	def combinationToWeek(self, comb, classes=None):
+		classes = {} if classes is None else classes
+		week = [[{} for j in range(24)] for i in range(7)]
+		for code, sec in comb:
+			if (code, sec) not in classes:
+				classes[(code, sec)] = self.addCourseInfoToSessions(code, sec)
+			for ses in classes[(code, sec)]:
+				for i in range(ses["duracion"]):
+					week[ses["dia"]][ses["hora"] + i] = ses
+		return week
 
-	# Gets all possible schedules from a selected list of courses
-	def getPossibleSchedules(self, data={}):
-		self.log("Generando todos los posibles horarios con los cursos {courses}...")
+	# Builds the list of sessions (with course info, sorted by day and hour) of a compact schedule on demand
+	def combinationToSessions(self, comb):
+		return sorted(
+			[ses for code, sec in comb for ses in self.addCourseInfoToSessions(code, sec)],
+			key=lambda ses : (ses["dia"], ses["hora"])
+		)
+
+	# Compiles the selected courses into (code, [((code, sec), mask), ...]) pairs, leaving out sections that conflict with themselves
+	# (and, with the conVacantes constraint, sections without free seats).
+	# The (code, sec) pairs are shared by every combination that contains them, keeping compact schedules small
+	def compileCourses(self, data={}, constraints=None):
 		data = self.coursesDataDict if data == {} else data
-		possibleSchedules = []
-		for comb in self.getClassCombinations(data):
-			schedule = self.mergeClassesIntoWeekIfPossible(comb)
-			if schedule != []:
-				possibleSchedules.append(schedule)
-		return possibleSchedules
+		constraints = self.checkConstraints(constraints)
+		hasSeats = lambda secData : not constraints.get("conVacantes") or secData["vacantes"] > secData["matriculados"]
+		return [(code, [
+			((code, sec), mask) for sec, secData in data[code]["secciones"].items() if hasSeats(secData)
+			for mask in [self.getSectionMask(code, sec)] if mask is not None
+		]) for code in data]
+
+	# Places one section of each course at a time on an occupancy mask, abandoning a branch as soon as a section conflicts
+	# or the optional prune(mask, chosen, depth, courses) func rules it out. If given, stats = [examined, placed] counts
+	# the sections tried and the ones placed (once per call, so it costs nothing when not given)
+	@staticmethod
+	def searchCombinations(courses, occupied=0, depth=0, chosen=(), prune=None, stats=None):
+		if stats is not None:
+			stats[0] += len(courses[depth][1]) if depth < len(courses) else 0
+			stats[1] += depth > 0
+		if depth == len(courses):
+			yield chosen
+			return
+		for pair, mask in courses[depth][1]:
+			if not mask & occupied:
+				comb = chosen + (pair,)
+				if prune is None or not prune(occupied | mask, comb, depth + 1, courses):
+					yield from ScheduleAssistant.searchCombinations(courses, occupied | mask, depth + 1, comb, prune, stats)
+
+	# Lazily yields the possible schedules from a selected list of courses, skipping the first offset and stopping after limit.
+	# With compact, each schedule is a tuple of (course code, section) pairs instead of a week matrix.
+	# With constraints (see getConstraintNames), partial schedules that can't satisfy them are abandoned during the search
+	def iterSchedules(self, data={}, limit=None, offset=0, compact=False, constraints=None):
+		data = self.coursesDataDict if data == {} else data
+		stop = None if limit is None else offset + limit
+		stats = [0, 0] if self.collectMetrics else None
+		courses = self.compileCourses(data, constraints)
+		prune = self.constraintPrune(constraints, courses)
+		combs = itertools.islice(self.searchCombinations(courses, prune=prune, stats=stats), offset, stop)
+		if stats is not None:
+			combs = self.trackSearch(combs, stats)
+		if compact:
+			yield from combs
+			return
+		classes = {}
+		for comb in combs:
+			yield self.combinationToWeek(comb, classes)
+
+	# Searches the combinations in which the leading courses at the indexes of fixed only use the given section index,
+	# returning (in serial order) up to stop of them (run in a worker process by getPossibleSchedulesParallel)
+	@staticmethod
+	def searchShard(courses, fixed, constraints=None, stop=None):
+		shard = [(code, [secs[fixed[i]]] if i in fixed else secs) for i, (code, secs) in enumerate(courses)]
+		prune = ScheduleAssistant.constraintPrune(constraints, shard)
+		return list(itertools.islice(ScheduleAssistant.searchCombinations(shard, prune=prune), stop))
+
+	# Splits the search between worker processes, sharding on the sections of the leading courses so the shards, taken in
+	# order, give the schedules in the same order as the serial search. Their results are concatenated as they finish,
+	# stopping (and cancelling the pending shards) once offset + limit schedules were found
+	def getPossibleSchedulesParallel(self, data={}, workers=None, limit=None, offset=0, compact=False, constraints=None):
+		data = self.coursesDataDict if data == {} else data
+		workers = os.cpu_count() if workers is None else workers
+		constraints = self.checkConstraints(constraints)
+		courses = self.compileCourses(data, constraints)
+
+		lead = 0
+		shardCount = 1
+		while lead < len(courses) and shardCount < workers * 4:
+			shardCount *= max(1, len(courses[lead][1]))
+			lead += 1
+
+		shards = []
+		for secIndexes in itertools.product(*[range(len(courses[i][1])) for i in range(lead)]):
+			mask = 0
+			for i, j in enumerate(secIndexes):
+				mask = -1 if mask & courses[i][1][j][1] else mask | courses[i][1][j][1]
+			if mask != -1:
+				shards.append(dict(enumerate(secIndexes)))
+
+		stop = None if limit is None else offset + limit
+		combs = []
+		executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+		try:
+			futures = [executor.submit(self.searchShard, courses, shard, constraints, stop) for shard in shards]
+			for future in futures:
+				combs += future.result()
+				if stop is not None and len(combs) >= stop:
+					break
+		finally:
+			executor.shutdown(wait=False, cancel_futures=True)
+
+		combs = combs[offset:stop]
+		self.countMetric("horariosEmitidos", len(combs))
+		if compact:
+			return combs
+		classes = {}
+		return [self.combinationToWeek(comb, classes) for comb in combs]
+
+	# Gets all possible schedules from a selected list of courses, in parallel if more than one worker is requested
+	@measuredPhase("generacion")
+	def getPossibleSchedules(self, data={}, limit=None, offset=0, workers=1, compact=False, constraints=None):
+		data = self.coursesDataDict if data == {} else data
+		self.log(f"Generando todos los posibles horarios con los cursos {', '.join(data.keys())}...")
+		if workers is None or workers > 1:
+			return self.getPossibleSchedulesParallel(data, workers, limit, offset, compact, constraints)
+		return list(self.iterSchedules(data, limit, offset, compact, constraints))
+
+	# Gets, for each depth of a search, the day-hours that the sections of the courses from that depth on could still occupy
+	@staticmethod
+	def reachMasks(courses):
+		reach = [0] * (len(courses) + 1)
+		for depth in range(len(courses) - 1, -1, -1):
+			reach[depth] = reach[depth + 1]
+			for sec, mask in courses[depth][1]:
+				reach[depth] |= mask
+		return reach
+
+	# Counts the possible schedules from a selected list of courses without building them, memoizing on the
+	# remaining courses and the occupied day-hours that those courses could still collide with.
+	# Constraints on the whole schedule can't be memoized that way, so with them the pruned search is counted instead,
+	# stopping at maxCount schedules if given (the count is then at least maxCount)
+	@measuredPhase("generacion")
+	def countSchedules(self, data={}, constraints=None, maxCount=None):
+		data = self.coursesDataDict if data == {} else data
+		courses = sorted(self.compileCourses(data, constraints), key=lambda course : len(course[1]))
+		prune = self.constraintPrune(constraints, courses)
+		if prune is not None:
+			return sum(1 for comb in itertools.islice(self.searchCombinations(courses, prune=prune), maxCount))
+		reach = self.reachMasks(courses)
+
+		memo = {}
+		def count(depth, occupied):
+			if depth == len(courses):
+				return 1
+			if depth == len(courses) - 1:
+				return sum(1 for sec, mask in courses[depth][1] if not mask & occupied)
+			key = (depth, occupied & reach[depth])
+			if key not in memo:
+				memo[key] = sum(count(depth + 1, occupied | mask) for sec, mask in courses[depth][1] if not mask & occupied)
+			return memo[key]
+		return count(0, 0) if maxCount is None else min(count(0, 0), maxCount)
+
+	#
+	# SCHEDULE RANKING FUNCS
+	#
+
+	# Hours of the week without classes between the first and last class of each day (negated, fewer is better)
+	def scoreIdleHours(self, mask, comb):
+		idle = 0
+		for dia in range(7):
+			day = (mask >> (dia * 24)) & 0xFFFFFF
+			if day:
+				idle += day.bit_length() - (day & -day).bit_length() + 1 - bin(day).count("1")
+		return -idle
+
+	# Days of the week without classes
+	def scoreFreeDays(self, mask, comb):
+		return sum(1 for dia in range(7) if not (mask >> (dia * 24)) & 0xFFFFFF)
+
+	# Hour of the earliest class of the week (later is better)
+	def scoreLatestStart(self, mask, comb):
+		start = 24
+		for dia in range(7):
+			day = (mask >> (dia * 24)) & 0xFFFFFF
+			if day:
+				start = min(start, (day & -day).bit_length() - 1)
+		return start
+
+	# Seats left (vacantes - matriculados) summed over the sections of the schedule
+	def scoreFreeSeats(self, mask, comb):
+		secs = lambda code, sec : self.coursesDataDict[code]["secciones"][sec]
+		return sum(secs(code, sec)["vacantes"] - secs(code, sec)["matriculados"] for code, sec in comb)
+
+	# Upper bound of scoreFreeSeats for a partial schedule: the seats placed so far plus the best section of each remaining course.
+	# The seats of every section and the sums of the best ones from each depth on are computed once per search (per courses list)
+	def boundFreeSeats(self, mask, comb, depth, courses):
+		if self.seatBounds is None or self.seatBounds[0] is not courses:
+			secs = lambda code, sec : self.coursesDataDict[code]["secciones"][sec]
+			seats = {pair : secs(*pair)["vacantes"] - secs(*pair)["matriculados"] for code, courseSecs in courses for pair, _ in courseSecs}
+			rest = [0] * (len(courses) + 1)
+			for i in range(len(courses) - 1, -1, -1):
+				rest[i] = rest[i + 1] + max((seats[pair] for pair, _ in courses[i][1]), default=0)
+			self.seatBounds = (courses, seats, rest)
+		_, seats, rest = self.seatBounds
+		return sum(seats[pair] for pair in comb) + rest[depth]
+
+	# Score funcs by criteria name, each paired with an upper bound func for partial schedules (None if it can't be bounded)
+	def getRankCriteria(self):
+		return {
+			"huecos": (self.scoreIdleHours, None),
+			"diasLibres": (self.scoreFreeDays, lambda mask, comb, depth, courses : self.scoreFreeDays(mask, comb)),
+			"horaInicio": (self.scoreLatestStart, lambda mask, comb, depth, courses : self.scoreLatestStart(mask, comb)),
+			"vacantes": (self.scoreFreeSeats, self.boundFreeSeats)
+		}
+
+	# Gets the k best schedules (as (score, week) pairs, or (score, compact schedule) with compact) by a criteria name
+	# or a score(mask, comb) func, keeping only the k best in a bounded heap and pruning branches whose bound can't beat the k-th best
+	# (or that can't satisfy the constraints). With maxCombinations, only that many schedules are examined (the best of those are returned)
+	@measuredPhase("generacion")
+	def getBestSchedules(self, data={}, score="huecos", k=10, bound=None, compact=False, constraints=None, maxCombinations=None):
+		data = self.coursesDataDict if data == {} else data
+		self.log(f"Buscando los {k} mejores horarios con los cursos {', '.join(data.keys())}...")
+		if type(score) == str:
+			score, bound = self.getRankCriteria()[score]
+		if k <= 0:
+			return []
+
+		best = []
+		courses = self.compileCourses(data, constraints)
+		prune = self.constraintPrune(constraints, courses)
+		if bound is not None:
+			prune = lambda mask, comb, depth, courses, fits=prune : (
+				(fits is not None and fits(mask, comb, depth, courses)) or (len(best) == k and bound(mask, comb, depth, courses) <= best[0][0])
+			)
+
+		stats = [0, 0] if self.collectMetrics else None
+		combs = self.searchCombinations(courses, prune=prune, stats=stats)
+		if stats is not None:
+			combs = self.trackSearch(combs, stats)
+		for seq, comb in enumerate(itertools.islice(combs, maxCombinations)):
+			mask = 0
+			for code, sec in comb:
+				mask |= self.getSectionMask(code, sec)
+			item = (score(mask, comb), -seq, comb)
+			if len(best) < k:
+				heapq.heappush(best, item)
+			elif item[0] > best[0][0]:
+				heapq.heapreplace(best, item)
+
+		best = [(value, comb) for value, _, comb in sorted(best, reverse=True)]
+		if compact:
+			return best
+		classes = {}
+		return [(value, self.combinationToWeek(comb, classes)) for value, comb in best]
+
+	#
+	# CONSTRAINT FUNCS
+	#
+
+	# Constraint names on the whole schedule accepted by the search funcs, with their description
+	def getConstraintNames(self):
+		return {
+			"diasLibres": "Minimo de dias libres de lunes a viernes",
+			"maxHorasDia": "Maximo de horas de clase en un dia",
+			"maxHuecosDia": "Maximo de horas libres entre la primera y la ultima clase de un dia",
+			"conVacantes": "Solo secciones con vacantes libres (vacantes > matriculados)",
+			"mismosDias": "Pares de cursos [(codigo, codigo), ...] cuyas secciones deben tener clases los mismos dias"
+		}
+
+	# Returns the constraints dictionary (empty if None), reporting and leaving out unknown constraint names
+	def checkConstraints(self, constraints=None):
+		constraints = {} if constraints is None else constraints
+		unknown = [name for name in constraints if name not in self.getConstraintNames()]
+		for name in unknown:
+			self.error(f"Restriccion {name} desconocida, se ignorara")
+		return {name : value for name, value in constraints.items() if name not in unknown}
+
+	# Gets the days (as a bitmask of day indexes) in which an occupancy mask has classes
+	@staticmethod
+	def maskToDays(mask):
+		days = 0
+		for dia in range(7):
+			if (mask >> (dia * 24)) & 0xFFFFFF:
+				days |= 1 << dia
+		return days
+
+	# Builds a prune(mask, comb, depth, courses) func for searchCombinations that rules out partial schedules that can't satisfy
+	# the constraints anymore, or None if there's nothing to check during the search (conVacantes is applied by compileCourses).
+	# Busy days and class hours only grow, and an idle hour of a partial schedule can only be filled by a remaining section, so
+	# the idle hours that no remaining course can cover are a lower bound of the final ones. Same days pairs are checked once both are placed
+	@staticmethod
+	def constraintPrune(constraints, courses):
+		constraints = {} if constraints is None else constraints
+		checks = []
+
+		if constraints.get("diasLibres"):
+			maxDays = 5 - constraints["diasLibres"]
+			checks.append(lambda mask, comb, depth : bin(ScheduleAssistant.maskToDays(mask) & 0b11111).count("1") > maxDays)
+
+		if constraints.get("maxHorasDia") is not None:
+			maxHours = constraints["maxHorasDia"]
+			checks.append(lambda mask, comb, depth : any(bin((mask >> (dia * 24)) & 0xFFFFFF).count("1") > maxHours for dia in range(7)))
+
+		if constraints.get("maxHuecosDia") is not None:
+			maxIdle = constraints["maxHuecosDia"]
+			dead = [~reach for reach in ScheduleAssistant.reachMasks(courses)]
+			shifts = [dia * 24 for dia in range(7)]
+			def tooIdle(mask, comb, depth):
+				for shift in shifts:
+					day = (mask >> shift) & 0xFFFFFF
+					if day and bin(((1 << day.bit_length()) - (day & -day)) & ~day & (dead[depth] >> shift) & 0xFFFFFF).count("1") > maxIdle:
+						return True
+				return False
+			checks.append(tooIdle)
+
+		if constraints.get("mismosDias"):
+			position = {code : i for i, (code, secs) in enumerate(courses)}
+			days = {pair : ScheduleAssistant.maskToDays(mask) for code, secs in courses for pair, mask in secs}
+			pairsAt = {}
+			for a, b in constraints["mismosDias"]:
+				if a in position and b in position and a != b:
+					i, j = sorted((position[a], position[b]))
+					pairsAt.setdefault(j + 1, []).append((i, j))
+			checks.append(lambda mask, comb, depth : any(days[comb[i]] != days[comb[j]] for i, j in pairsAt.get(depth, ())))
+
+		if len(checks) == 0:
+			return None
+		if len(checks) == 1:
+			return lambda mask, comb, depth, courses, check=checks[0] : check(mask, comb, depth)
+		return lambda mask, comb, depth, courses : any(check(mask, comb, depth) for check in checks)
+
+	#
+	# INDEX FUNCS
+	#
+
+	# Normalizes a professor name for the index (lowercase and without spaces, as the queries of filterByProf)
+	def normalizeProf(self, prof):
+		return str(prof).replace(" ", "").lower()
+
+	# Adds the sections of a course to the indexes: professors and days of any of their sessions, earliest start hour,
+	# latest end hour and the duration shared by all of their sessions
+	def indexCourse(self, code):
+		for sec, secData in self.coursesDataDict[code]["secciones"].items():
+			sessions = secData["sesiones"]
+			keys = {
+				"docente": {self.normalizeProf(ses["docente"]) for ses in sessions},
+				"dia": {ses["dia"] for ses in sessions},
+				"inicio": {min([ses["hora"] for ses in sessions], default=24)},
+				"fin": {max([ses["hora"] + ses["duracion"] for ses in sessions], default=0)},
+				"duracion": {ses["duracion"] for ses in sessions} if len({ses["duracion"] for ses in sessions}) == 1 else set()
+			}
+			for name, values in keys.items():
+				for value in values:
+					self.indexes[name].setdefault(value, set()).add((code, sec))
+			self.indexes["secciones"][(code, sec)] = keys
+		self.indexes["porCurso"][code] = list(self.coursesDataDict[code]["secciones"])
+
+	# Removes the sections of a course from the indexes
+	def unindexCourse(self, code):
+		for sec in self.indexes["porCurso"].pop(code, []):
+			for name, values in self.indexes["secciones"].pop((code, sec)).items():
+				for value in values:
+					self.indexes[name][value].discard((code, sec))
+					if len(self.indexes[name][value]) == 0:
+						del self.indexes[name][value]
+
+	# Builds the inverted indexes (value -> set of (course code, section) pairs) of the loaded courses dictionary
+	def buildIndexes(self):
+		self.indexes = {name : {} for name in ["docente", "dia", "inicio", "fin", "duracion", "secciones", "porCurso"]}
+		self.indexes["cursos"] = {code : i for i, code in enumerate(self.coursesDataDict)}
+		for code in self.coursesDataDict:
+			self.indexCourse(code)
+		return self.indexes
+
+	# Gets the inverted indexes, building them if the courses dictionary changed since
+	def getIndexes(self):
+		return self.buildIndexes() if self.indexes is None else self.indexes
+
+	# Gets the union of the sections found in an index under the given values
+	def unionIndex(self, name, values):
+		index = self.getIndexes()[name]
+		return set().union(*[index[value] for value in values if value in index])
+
+	# Builds a courses dictionary (as the filterBy funcs) from a set of (course code, section) pairs that are also in baseData
+	def sectionsToData(self, sections, baseData={}):
+		baseData = self.coursesDataDict if baseData == {} else baseData
+		order = self.getIndexes()["cursos"]
+		result = {}
+		for code, sec in sorted(sections, key=lambda i : (order.get(i[0], len(order)), i[1])):
+			if code in baseData and sec in baseData[code]["secciones"]:
+				if code not in result:
+					result[code] = {"nombre" : baseData[code]["nombre"], "secciones": {}}
+				result[code]["secciones"][sec] = baseData[code]["secciones"][sec]
+		return result
 
 	#
 	# FILTERING FUNCS
 	#
 
+	@measuredPhase("filtrado")
 	def filterBy(self, func, allSes=True, baseData={}):
 		baseData = self.coursesDataDict if baseData == {} else baseData
 		result = {}
@@ -452,21 +1685,103 @@ class ScheduleAssistant:
 				result[code] = {"nombre" : courseData["nombre"], "secciones": secsFound}
 		return result
 
+	@measuredPhase("filtrado")
 	def filterByProf(self, query="", baseData={}):
-		if query == "":
+		queries = [q for q in query.replace(" ", "").lower().split(",") if q != ""]
+		if len(queries) == 0:
 			return baseData
-		queries = query.replace(" ", "").lower().split(",")
-		return self.mergeCoursesData([baseData, self.filterByProf(",".join(queries[1:]), self.filterBy(lambda ses : queries[0] in ses["docente"].lower(), False))])
-
+		indexes = self.getIndexes()
+		found = set()
+		for q in queries:
+			for prof, secs in indexes["docente"].items():
+				if q in prof:
+					found |= secs
+		return self.sectionsToData(found, baseData)
+
+	@measuredPhase("filtrado")
 	def filterByMinBegTime(self, time=0, baseData={}):
-		return self.filterBy(lambda ses : time <= ses["hora"], True, baseData)
+		return self.sectionsToData(self.unionIndex("inicio", range(max(time, 0), 25)), baseData)
 
+	@measuredPhase("filtrado")
 	def filterByMaxEndTime(self, time=24, baseData={}):
-		return self.filterBy(lambda ses : time >= ses["hora"] + ses["duracion"], True, baseData)
+		return self.sectionsToData(self.unionIndex("fin", range(0, min(time, 24) + 1)), baseData)
 
+	@measuredPhase("filtrado")
 	def filterByDurTime(self, time=2, baseData={}):
-		return self.filterBy(lambda ses : time == ses["duracion"], True, baseData)	
-	
+		return self.sectionsToData(self.getIndexes()["duracion"].get(time, set()), baseData)
+
+	#
+	# WATCH FUNCS
+	#
+
+	# Downloads the courses pdf again (over HTTP if possible, with the browser otherwise) and applies the changes to the catalog
+	def refreshFromSource(self):
+		if not self.fetchScheduleData():
+			if not hasattr(self, "br") and not self.initWebdriver():
+				return None
+			if not self.login() or not self.downloadScheduleData():
+				return None
+		return self.refreshCatalog()
+
+	# Gets the (vacantes, matriculados) of the watched sections, None for the ones not in the catalog
+	def getSeats(self, watched):
+		secs = lambda code, sec : self.coursesDataDict.get(code, {}).get("secciones", {}).get(sec)
+		return {(code, sec) : (secs(code, sec)["vacantes"], secs(code, sec)["matriculados"]) if secs(code, sec) else None for code, sec in watched}
+
+	# Emits a seat change event as a JSON line to stdout, and optionally appends it to a file and POSTs it to a webhook
+	def emitSeatEvent(self, event, eventsFile="", webhook=""):
+		line = json.dumps(event, ensure_ascii=False)
+		print(line, flush=True)
+		if eventsFile != "":
+			with open(eventsFile, "a") as file:
+				file.write(line + "\n")
+		if webhook != "":
+			request = urllib.request.Request(webhook, data=line.encode(), headers={"Content-Type": "application/json"}, method="POST")
+			try:
+				urllib.request.urlopen(request, timeout=self.timeout).close()
+			except Exception as e:
+				self.error(f"No se pudo enviar el evento al webhook {webhook}: {e}")
+
+	# Periodically refreshes the catalog and emits an event whenever the seats of a watched (course code, section) change.
+	# Sleeps interval seconds (+- jitter as a fraction) between refreshes, backing off after failed ones, up to iterations times
+	def watchSeats(self, watched, interval=300, jitter=0.1, iterations=None, eventsFile="", webhook=""):
+		watched = [(code.upper(), str(sec)) for code, sec in watched]
+		seats = self.getSeats(watched)
+		failures = 0
+		iteration = 0
+		while iterations is None or iteration < iterations:
+			iteration += 1
+			time.sleep(interval * (2 ** min(failures, 4)) * (1 + random.uniform(-jitter, jitter)))
+			try:
+				delta = self.refreshFromSource()
+			except Exception as e:
+				print(e)
+				delta = None
+			if delta is None:
+				failures += 1
+				self.error(f"No se pudo actualizar la data de horarios ({failures} intentos fallidos)")
+				continue
+			failures = 0
+
+			newSeats = self.getSeats(watched)
+			for (code, sec), now in newSeats.items():
+				before = seats[(code, sec)]
+				if now == before:
+					continue
+				event = {"tiempo": datetime.now().isoformat(timespec="seconds"), "codigo": code, "seccion": sec}
+				if now is None:
+					event["tipo"] = "eliminada"
+				else:
+					event["vacantes"], event["matriculados"] = now
+					event["libres"] = now[0] - now[1]
+					if before is None:
+						event["tipo"] = "agregada"
+					else:
+						event["antes"] = list(before)
+						event["tipo"] = "cupoLibre" if before[0] - before[1] <= 0 < now[0] - now[1] else "vacantes"
+				self.emitSeatEvent(event, eventsFile, webhook)
+			seats = newSeats
+
 	#
 	# UI FUNCS
 	#
@@ -488,6 +1803,15 @@ class ScheduleAssistant:
 		return int(selection) - 1
 	
 
+	def intSelector(self, minValue, maxValue):
+		value = minValue - 1
+		while value < minValue or value > maxValue:
+			try:
+				value = int(input(">"))
+			except:
+				continue
+		return value
+
 	def boolSelector(self):
 		print("Selecciona [si] o [no]:")
 		yOps = ["si", "s", "yes", "y", "1", "true", "t"]
@@ -503,6 +1827,11 @@ class ScheduleAssistant:
 		print("Desea descargar el archivo de data automaticamente?")
 
 		if self.boolSelector():
+			if self.loadFetchState().get("reportURL") and self.fetchScheduleData():
+				if not self.pdfToDict():
+					return False
+				self.log("")
+				return True
 			print("Seleccione el browser que desea usar [C] Chrome o [F] Firefox:")
 			selBrowser = ""
 			while selBrowser not in ["C", "F"]:
@@ -510,13 +1839,11 @@ class ScheduleAssistant:
 			if not self.initWebdriver(selBrowser):
 				return False
 			self.log("")
-			if not self.login(input("Ingrese su email de la UTEC: "), input("Ingrese su password de la UTEC: ")):
+			if not self.hasSession() and not self.login(input("Ingrese su email de la UTEC: "), input("Ingrese su password de la UTEC: "), False):
 				return False
 			if not self.downloadScheduleData():
 				return False
-			if not self.pdfToTable():
-				return False
-			if not self.tableToDict():
+			if not self.pdfToDict():
 				return False
 			self.log("")
 			return True
@@ -550,70 +1877,59 @@ class ScheduleAssistant:
 			print()
 
 	def filterMenu(self, data={}):
-		data = self.coursesDataDict if data == {} else data
-		print("\nFILTRAR CURSOS")
-		op = self.optionIndexSelector([
-			"Seleccionar cursos",
-			"Filtrar por profesor",
-			"Filtrar por hora minima de inicio de las sesiones",
-			"Filtrar por hora maxima de fin de las sesiones",
-			"Filtrar por hora de duracion de la sesion"
-		])
-
-		if op == 0:
-			print("\n".join([f"[{i}]" for i in data.keys()]))
-			print("Escribe los cursos a seleccionar separados por coma , :")
-			courses = [course for course in input(">").replace(" ", "").upper().split(",") if course in data]
-			data = {k : v for k, v in data.items() if k in courses}
-			print(f"{len(courses)} cursos seleccionados")
-		elif op == 1:
-			data = self.filterByProf(input("Ingrese profesor a buscar:\n>"), data)
-		elif op == 2:
-			print("Ingrese la hora minima de inicio de las sesiones:")
-			time = -1
-			while time < 0 or time > 23:
-				try:
-					time = int(input(">"))
-				except:
-					continue
-			data = self.filterByMinBegTime(time, data)
-		elif op == 3:
-			print("Ingrese la hora maxima de fin de las sesiones:")
-			time = -1
-			while time < 0 or time > 23:
-				try:
-					time = int(input(">"))
-				except:
-					continue
-			data = self.filterByMaxEndTime(time, data)
-		elif op == 4:
-			print("Ingrese la hora de duracion de la sesion:")
-			time = -1
-			while time < 1 or time > 5:
-				try:
-					time = int(input(">"))
-				except:
-					continue
-			data = self.filterByDurTime(time, data)
-		
-		secsFound = sum([len(data[course]["secciones"]) for course in data])
-		print(f"\nSe encontraron {secsFound} secciones en {len(data)} cursos")
-		print("Que desea hacer con la informacion filtrada?")
-
-		op = 0
-		while op == 0:
+		query = CourseQuery(self, None if data == {} else data)
+		data = query.data()
+		while True:
+			print("\nFILTRAR CURSOS")
 			op = self.optionIndexSelector([
-				"Mostrar informacion de los cursos filtrados",
-				"Aplicar un nuevo filtro",
-				"Salir"
+				"Seleccionar cursos",
+				"Filtrar por profesor",
+				"Filtrar por hora minima de inicio de las sesiones",
+				"Filtrar por hora maxima de fin de las sesiones",
+				"Filtrar por hora de duracion de la sesion",
+				"Filtrar por cantidad minima de vacantes libres"
 			])
 
 			if op == 0:
-				self.printCoursesInfo(data)
+				print("\n".join([f"[{i}]" for i in data.keys()]))
+				print("Escribe los cursos a seleccionar separados por coma , :")
+				courses = [course for course in input(">").replace(" ", "").upper().split(",") if course in data]
+				query.courses(courses)
+				print(f"{len(courses)} cursos seleccionados")
 			elif op == 1:
-				return self.filterMenu(data)
-
-		return data
+				query.prof(input("Ingrese profesor a buscar:\n>"))
+			elif op == 2:
+				print("Ingrese la hora minima de inicio de las sesiones:")
+				query.minBegTime(self.intSelector(0, 23))
+			elif op == 3:
+				print("Ingrese la hora maxima de fin de las sesiones:")
+				query.maxEndTime(self.intSelector(0, 23))
+			elif op == 4:
+				print("Ingrese la hora de duracion de la sesion:")
+				query.durTime(self.intSelector(1, 5))
+			elif op == 5:
+				print("Ingrese la cantidad minima de vacantes libres:")
+				query.minFreeSeats(self.intSelector(0, 999))
+
+			data = query.data()
+			secsFound = sum([len(data[course]["secciones"]) for course in data])
+			print(f"\nSe encontraron {secsFound} secciones en {len(data)} cursos")
+			print(f"Horarios posibles con todos los cursos filtrados: {query.count() if len(data) > 0 else 0}")
+			print("Que desea hacer con la informacion filtrada?")
+
+			op = 0
+			while op == 0:
+				op = self.optionIndexSelector([
+					"Mostrar informacion de los cursos filtrados",
+					"Aplicar un nuevo filtro",
+					"Salir"
+				])
+
+				if op == 0:
+					self.printCoursesInfo(data)
+
+			if op == 2:
+				return data
 	
 	def mainMenu(self):
 		op = 0
@@ -639,7 +1955,7 @@ class ScheduleAssistant:
 				self.filterMenu()
 	
 	def begin(self):
-		exists = dict(zip(["JSON", "CSV", "PDF"], [os.path.exists(i) for i in [self.jsonName, self.csvName, self.pdfName]]))
+		exists = dict(zip(["JSON", "SQLite", "CSV", "PDF"], [os.path.exists(i) for i in [self.jsonName, self.sqliteName, self.csvName, self.pdfName]]))
 		existent = [i for i in exists if exists[i]]
 
 		if len(existent) > 0:
@@ -650,23 +1966,17 @@ class ScheduleAssistant:
 				if not self.downloadPDF():
 					return False
 			elif existent[op] == "PDF":
-				if not self.pdfToTable():
-					return False
-				if not self.tableToDict():
+				if not self.pdfToDict():
 					return False
 			elif existent[op] == "CSV":
-				with open(self.csvName, "r") as file:
-					self.coursesDataTable = [line.replace("\n", "").split(",") for line in file.readlines()]
-				if not self.tableToDict():
+				if not self.loadCSV():
 					return False
 			elif existent[op] == "JSON":
-				with open(self.jsonName, "r") as file:
-					try:
-						self.coursesDataDict = json.load(file)
-					except Exception as e:
-						print(e)
-						self.error(f"No se pudo leer archivo JSON {self.jsonName}")
-						return False
+				if not self.loadJSON():
+					return False
+			elif existent[op] == "SQLite":
+				if not self.loadSQLite():
+					return False
 			self.log("")
 		else:
 			print(f"No se encontro el archivo de data de horarios de los cursos disponibles en PDF ({self.pdfName}), CSV ({self.csvName}), o JSON ({self.jsonName})")
@@ -680,6 +1990,242 @@ class ScheduleAssistant:
 		
 		self.mainMenu()
 
+#
+# QUERY
+#
+
+# Accumulates course filters and evaluates all of them in a single pass over the candidate sections, using the assistant's indexes
+class CourseQuery:
+
+	# Constructor - Starts an empty query over the courses of an assistant, or over a base courses dictionary (None for the whole catalog)
+	def __init__(self, assistant, baseData=None):
+		self.assistant = assistant
+		self.baseData = baseData
+		self.codes = None
+		self.profs = []
+		self.minBeg = 0
+		self.maxEnd = 24
+		self.durs = None
+		self.minSeats = None
+		self.limits = {}
+		self.result = None
+
+	# Keeps only the given course codes
+	def courses(self, codes):
+		self.codes = set(codes) if self.codes is None else self.codes & set(codes)
+		self.result = None
+		return self
+
+	# Keeps the sections with a session taught by any of the comma separated professors
+	def prof(self, query=""):
+		queries = [q for q in query.replace(" ", "").lower().split(",") if q != ""]
+		if len(queries) > 0:
+			self.profs.append(queries)
+			self.result = None
+		return self
+
+	# Keeps the sections whose sessions all start at or after the given hour
+	def minBegTime(self, time=0):
+		self.minBeg = max(self.minBeg, time)
+		self.result = None
+		return self
+
+	# Keeps the sections whose sessions all end at or before the given hour
+	def maxEndTime(self, time=24):
+		self.maxEnd = min(self.maxEnd, time)
+		self.result = None
+		return self
+
+	# Keeps the sections whose sessions all last the given hours
+	def durTime(self, time=2):
+		self.durs = {time} if self.durs is None else self.durs & {time}
+		self.result = None
+		return self
+
+	# Keeps the sections with at least the given free seats (vacantes - matriculados)
+	def minFreeSeats(self, seats=1):
+		self.minSeats = seats if self.minSeats is None else max(self.minSeats, seats)
+		self.result = None
+		return self
+
+	# Adds constraints on the whole schedule (see ScheduleAssistant.getConstraintNames), checked while searching the schedules
+	def constraints(self, **constraints):
+		self.limits = {**self.limits, **constraints}
+		return self
+
+	# Evaluates every filter in one pass, returning a courses dictionary as the filterBy funcs (cached until a filter is added)
+	def data(self):
+		if self.result is not None:
+			return self.result
+		with self.assistant.measurePhase("filtrado"):
+			return self.evaluate()
+
+	# Runs the single pass of data over the candidate sections
+	def evaluate(self):
+		baseData = self.assistant.coursesDataDict if self.baseData is None else self.baseData
+		indexes = self.assistant.getIndexes()
+		profSets = [{prof for prof in indexes["docente"] if any(q in prof for q in queries)} for queries in self.profs]
+
+		self.result = {}
+		for code in (baseData if self.codes is None else [code for code in baseData if code in self.codes]):
+			secsFound = {}
+			for sec, secData in baseData[code]["secciones"].items():
+				keys = indexes["secciones"].get((code, sec))
+				if keys is None:
+					continue
+				(inicio,), (fin,) = keys["inicio"], keys["fin"]
+				if inicio < self.minBeg or fin > self.maxEnd:
+					continue
+				if self.durs is not None and not keys["duracion"] & self.durs:
+					continue
+				if not all(keys["docente"] & profs for profs in profSets):
+					continue
+				if self.minSeats is not None and secData["vacantes"] - secData["matriculados"] < self.minSeats:
+					continue
+				secsFound[sec] = secData
+			if len(secsFound) > 0:
+				self.result[code] = {"nombre" : baseData[code]["nombre"], "secciones": secsFound}
+		return self.result
+
+	# Gets the (course code, section) pairs that pass every filter
+	def sections(self):
+		return [(code, sec) for code, courseData in self.data().items() for sec in courseData["secciones"]]
+
+	# Counts the possible schedules with the filtered sections that satisfy the constraints, up to maxCount if given.
+	# No schedules if no section passes the filters (the assistant funcs would take an empty dictionary as the whole catalog)
+	def count(self, maxCount=None):
+		if len(self.data()) == 0:
+			return 0
+		return self.assistant.countSchedules(self.data(), self.limits, maxCount)
+
+	# Lazily yields the possible schedules with the filtered sections that satisfy the constraints (see ScheduleAssistant.iterSchedules),
+	# none if no section passes the filters
+	def schedules(self, limit=None, offset=0, compact=False):
+		if len(self.data()) == 0:
+			return iter(())
+		return self.assistant.iterSchedules(self.data(), limit, offset, compact, self.limits)
+
+#
+# COMPACT MODEL
+#
+
+# Slotted record that behaves as the dict it replaces in the courses dictionary: same keys (the names in fields, leaving out
+# the unset ones), values, equality with dicts and JSON output (through plain). Assigned values are compacted by compactValue
+class CompactRecord(collections.abc.MutableMapping):
+
+	__slots__ = ()
+	fields = ()
+	fieldSet = frozenset()
+
+	# Keeps the field names of every record class as a set, so checking a key doesn't scan the fields
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		cls.fieldSet = frozenset(cls.fields)
+
+	# Builds a record from a mapping with (some of) its fields, or returns it if it already is one
+	@classmethod
+	def fromMapping(cls, data):
+		if type(data) == cls:
+			return data
+		record = cls.__new__(cls)
+		compactValue = cls.compactValue
+		for key in cls.fields:
+			if key in data:
+				setattr(record, key, compactValue(key, data[key]))
+		return record
+
+	# Converts a value assigned to a field to its compact form
+	@classmethod
+	def compactValue(cls, key, value):
+		return sys.intern(value) if type(value) == str else value
+
+	# Converts records (inside dicts and lists too) back to plain dicts, as they were before being compacted
+	@staticmethod
+	def plain(value):
+		if isinstance(value, CompactRecord):
+			return {key : CompactRecord.plain(getattr(value, key)) for key in value}
+		if type(value) == dict:
+			return {key : CompactRecord.plain(i) for key, i in value.items()}
+		if type(value) == list:
+			return [CompactRecord.plain(i) for i in value]
+		return value
+
+	# Gets the record as a plain dict (used as the default func of json.dump)
+	def toDict(self):
+		return CompactRecord.plain(self)
+
+	# Only field names are keys (not the other attributes, as the methods), any other key or an unset field raises KeyError
+	def __getitem__(self, key):
+		try:
+			if key in self.fieldSet:
+				return getattr(self, key)
+		except (AttributeError, TypeError):
+			pass
+		raise KeyError(key)
+
+	def __contains__(self, key):
+		try:
+			return key in self.fieldSet and hasattr(self, key)
+		except TypeError:
+			return False
+
+	def __setitem__(self, key, value):
+		if key not in self.fieldSet:
+			raise KeyError(f"{type(self).__name__} no tiene el campo {key}")
+		setattr(self, key, self.compactValue(key, value))
+
+	def __delitem__(self, key):
+		if key not in self:
+			raise KeyError(key)
+		delattr(self, key)
+
+	def __iter__(self):
+		return (key for key in self.fields if hasattr(self, key))
+
+	def __len__(self):
+		return sum(1 for key in self)
+
+	def __eq__(self, other):
+		if type(other) == type(self):
+			return all(getattr(self, key, None) == getattr(other, key, None) and hasattr(self, key) == hasattr(other, key) for key in self.fields)
+		return collections.abc.Mapping.__eq__(self, other)
+
+	def __repr__(self):
+		return repr(self.toDict())
+
+# Session of a section, with interned name and professor and int day, hour and duration
+class Session(CompactRecord):
+
+	__slots__ = fields = ("sesion", "dia", "hora", "duracion", "docente")
+
+	@classmethod
+	def compactValue(cls, key, value):
+		if key in ("dia", "hora", "duracion"):
+			return int(value)
+		return sys.intern(value) if type(value) == str else value
+
+# Section of a course, with its seats and list of Session records
+class Section(CompactRecord):
+
+	__slots__ = fields = ("vacantes", "matriculados", "sesiones")
+
+	@classmethod
+	def compactValue(cls, key, value):
+		if key == "sesiones":
+			return [Session.fromMapping(ses) for ses in value]
+		return CompactRecord.compactValue(key, value)
+
+# Course, with its name, malla and dict of Section records by (interned) section number
+class Course(CompactRecord):
+
+	__slots__ = fields = ("nombre", "malla", "secciones")
+
+	@classmethod
+	def compactValue(cls, key, value):
+		if key == "secciones":
+			return {sys.intern(sec) : Section.fromMapping(secData) for sec, secData in value.items()}
+		return CompactRecord.compactValue(key, value)
+
 # BEGIN COMMAND
 if __name__ == "__main__":
 	assistant = ScheduleAssistant()
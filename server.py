@@ -0,0 +1,259 @@
+from scheduleAssistant import ScheduleAssistant, CourseQuery, CompactRecord
+import batch
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import urllib.parse
+
+# Local HTTP service that keeps the courses catalog (and its masks and indexes) in memory, answering queries of many clients
+# from one event loop and generating schedules in worker processes
+class ScheduleServer:
+
+	statusNames = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+	# Constructor - Sets the catalog file, the limits of the service and whether to keep the catalog as compact records (less memory)
+	def __init__(self, jsonName, workers=1, timeout=10, maxSchedules=100, maxSections=2000, maxBody=65536, reloadInterval=2, compact=False):
+		self.jsonName = jsonName
+		self.compact = compact
+		self.workers = workers
+		self.timeout = timeout
+		self.maxSchedules = maxSchedules
+		self.maxSections = maxSections
+		self.maxBody = maxBody
+		self.reloadInterval = reloadInterval
+		self.assistant = None
+		self.executor = None
+		self.mtime = None
+
+	#
+	# CATALOG FUNCS
+	#
+
+	# Reads the catalog file into a new assistant with its masks and indexes compiled (run in a thread by reloadCatalog)
+	def loadCatalog(self):
+		mtime = os.stat(self.jsonName).st_mtime_ns
+		with open(self.jsonName, "r") as file:
+			data = json.load(file)
+		with contextlib.redirect_stdout(io.StringIO()):
+			assistant = ScheduleAssistant()
+		assistant.logCurrentProcess = False
+		assistant.useCompactModel = self.compact
+		assistant.setCoursesData(data)
+		assistant.compileSectionMasks()
+		assistant.buildIndexes()
+		return assistant, mtime
+
+	# Loads the catalog without blocking the event loop and swaps it (and the worker processes, loaded with it) in once ready.
+	# Requests already running keep using the previous catalog
+	async def reloadCatalog(self):
+		assistant, mtime = await asyncio.get_running_loop().run_in_executor(None, self.loadCatalog)
+		self.assistant, self.mtime = assistant, mtime
+		self.replaceWorkers()
+		print(f"# Catalogo {self.jsonName} cargado ({len(assistant.coursesDataDict)} cursos)")
+
+	# Starts new worker processes with the current catalog for the next requests. The previous ones finish the jobs they already have and exit
+	def replaceWorkers(self):
+		oldExecutor = self.executor
+		self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=batch.initWorker, initargs=(self.assistant.coursesDataDict, self.compact))
+		if oldExecutor is not None:
+			oldExecutor.shutdown(wait=False)
+
+	# Reloads the catalog whenever its file changes
+	async def watchCatalog(self):
+		while True:
+			await asyncio.sleep(self.reloadInterval)
+			try:
+				if os.stat(self.jsonName).st_mtime_ns != self.mtime:
+					await self.reloadCatalog()
+			except Exception as e:
+				print(f"\n---\nERROR: No se pudo recargar el catalogo {self.jsonName}: {e}")
+
+	#
+	# HTTP FUNCS
+	#
+
+	# Reads one request from a connection, returning (method, path, params, body, keepAlive) or None if the connection was closed
+	async def readRequest(self, reader):
+		line = await asyncio.wait_for(reader.readline(), self.timeout)
+		if line == b"":
+			return None
+		method, target, version = line.decode("latin-1").split()
+		headers = {}
+		while True:
+			line = await asyncio.wait_for(reader.readline(), self.timeout)
+			if line in (b"\r\n", b"\n", b""):
+				break
+			name, value = line.decode("latin-1").split(":", 1)
+			headers[name.strip().lower()] = value.strip()
+		length = int(headers.get("content-length", 0))
+		if length > self.maxBody:
+			raise ValueError(413)
+		body = await asyncio.wait_for(reader.readexactly(length), self.timeout) if length > 0 else b""
+		url = urllib.parse.urlsplit(target)
+		params = dict(urllib.parse.parse_qsl(url.query))
+		return method, urllib.parse.unquote(url.path), params, body, headers.get("connection", "").lower() != "close"
+
+	# Writes a response, as JSON unless the body is already a string
+	async def writeResponse(self, writer, status, body, keepAlive=True):
+		contentType = "text/plain; charset=utf-8" if type(body) == str else "application/json"
+		data = (body if type(body) == str else json.dumps(body, default=CompactRecord.toDict)).encode("utf-8")
+		writer.write((
+			f"HTTP/1.1 {status} {self.statusNames[status]}\r\nContent-Type: {contentType}\r\nContent-Length: {len(data)}\r\n"
+			f"Connection: {'keep-alive' if keepAlive else 'close'}\r\n\r\n"
+		).encode("latin-1") + data)
+		await writer.drain()
+
+	# Serves the requests of a connection until the client closes it or a request fails to be read
+	async def handleConnection(self, reader, writer):
+		try:
+			while True:
+				try:
+					request = await self.readRequest(reader)
+				except ValueError as e:
+					await self.writeResponse(writer, 413 if e.args == (413,) else 400, {"error": "Solicitud invalida"}, False)
+					break
+				if request is None:
+					break
+				method, path, params, body, keepAlive = request
+				status, response = await self.route(method, path, params, body)
+				await self.writeResponse(writer, status, response, keepAlive)
+				if not keepAlive:
+					break
+		except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+			pass
+		finally:
+			writer.close()
+
+	# Dispatches a request to its endpoint, returning (status, body)
+	async def route(self, method, path, params, body):
+		if self.assistant is None:
+			return 503, {"error": "Catalogo no cargado"}
+		parts = [i for i in path.split("/") if i != ""]
+		try:
+			if parts == ["cursos"] and method == "GET":
+				return 200, self.listCourses()
+			if len(parts) == 2 and parts[0] == "cursos" and method == "GET":
+				return self.courseInfo(parts[1], params.get("formato", "json"))
+			if parts == ["filtrar"] and method in ("GET", "POST"):
+				return self.filterCourses(json.loads(body) if method == "POST" else self.paramsToQuery(params))
+			if parts == ["horarios"] and method in ("GET", "POST"):
+				return await self.generateSchedules(json.loads(body) if method == "POST" else self.paramsToQuery(params))
+			if parts in (["cursos"], ["filtrar"], ["horarios"]) or (len(parts) == 2 and parts[0] == "cursos"):
+				return 405, {"error": f"Metodo {method} no permitido"}
+			return 404, {"error": f"Ruta {path} no encontrada"}
+		except (ValueError, TypeError, KeyError) as e:
+			return 400, {"error": f"{type(e).__name__}: {e}"}
+		except Exception as e:
+			return 500, {"error": f"{type(e).__name__}: {e}"}
+
+	#
+	# ENDPOINT FUNCS
+	#
+
+	# Converts query string params to a query as the ones of batch.runQuery (cursos comma separated, numbers as int, contar as bool)
+	def paramsToQuery(self, params):
+		query = {}
+		for name, value in params.items():
+			if name == "cursos":
+				query[name] = [i for i in value.split(",") if i != ""]
+			elif name in ("horaInicio", "horaFin", "duracion", "vacantesLibres", "limite", "maxCombinaciones"):
+				query[name] = int(value)
+			elif name == "contar":
+				query[name] = value.lower() not in ("0", "false", "no")
+			else:
+				query[name] = value
+		return query
+
+	# GET /cursos - Code, name and number of sections of every course
+	def listCourses(self):
+		return [{"codigo": code, "nombre": data["nombre"], "secciones": len(data["secciones"])} for code, data in self.assistant.coursesDataDict.items()]
+
+	# GET /cursos/<codigo> - Data of a course, or the text of printCourseInfo with formato=texto
+	def courseInfo(self, code, format="json"):
+		if code not in self.assistant.coursesDataDict:
+			return 404, {"error": f"Curso {code} no encontrado"}
+		if format == "texto":
+			output = io.StringIO()
+			with contextlib.redirect_stdout(output):
+				self.assistant.printCourseInfo(code)
+			return 200, output.getvalue().strip() + "\n"
+		return 200, {"codigo": code, **self.assistant.coursesDataDict[code]}
+
+	# GET|POST /filtrar - Courses dictionary with the sections that pass the filters of the query (up to maxSections sections)
+	def filterCourses(self, query):
+		courseQuery = CourseQuery(self.assistant)
+		if "cursos" in query:
+			courseQuery.courses(query["cursos"])
+		if "docente" in query:
+			courseQuery.prof(query["docente"])
+		if "horaInicio" in query:
+			courseQuery.minBegTime(query["horaInicio"])
+		if "horaFin" in query:
+			courseQuery.maxEndTime(query["horaFin"])
+		if "duracion" in query:
+			courseQuery.durTime(query["duracion"])
+		if "vacantesLibres" in query:
+			courseQuery.minFreeSeats(query["vacantesLibres"])
+		sections = courseQuery.sections()
+		if len(sections) > self.maxSections:
+			return 413, {"error": f"El resultado tiene {len(sections)} secciones (maximo {self.maxSections}), agregar filtros"}
+		return 200, courseQuery.data()
+
+	# GET|POST /horarios - Schedules of a query as the ones of batch.runQuery, generated in a worker process within the timeout.
+	# The worker aborts the query at the timeout; if it still doesn't answer a second later, the workers are replaced so it can't hold them
+	async def generateSchedules(self, query):
+		if "cursos" not in query or len(query["cursos"]) == 0:
+			raise ValueError("Falta la lista de cursos")
+		query = {**query, "limite": min(query.get("limite", 10), self.maxSchedules), "segundosMax": self.timeout}
+		future = asyncio.get_running_loop().run_in_executor(self.executor, batch.runQuery, query)
+		try:
+			result = await asyncio.wait_for(future, self.timeout + 1)
+		except asyncio.TimeoutError:
+			self.replaceWorkers()
+			result = None
+		if result is None or result.get("error", "").startswith("TimeoutError"):
+			return 504, {"error": f"La generacion de horarios supero el tiempo limite de {self.timeout} s"}
+		return (400 if "error" in result else 200), result
+
+	#
+	# RUN
+	#
+
+	# Loads the catalog and serves until interrupted
+	async def serve(self, host="127.0.0.1", port=8080):
+		await self.reloadCatalog()
+		server = await asyncio.start_server(self.handleConnection, host, port)
+		watcher = asyncio.create_task(self.watchCatalog())
+		print(f"# Sirviendo en http://{host}:{port}")
+		try:
+			async with server:
+				await server.serve_forever()
+		finally:
+			watcher.cancel()
+			self.executor.shutdown(wait=False, cancel_futures=True)
+
+#
+# MAIN
+#
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Servicio HTTP local de consultas de cursos y horarios sobre un catalogo en memoria")
+	parser.add_argument("--host", default="127.0.0.1", help="Direccion en la que escuchar (por defecto 127.0.0.1)")
+	parser.add_argument("--puerto", type=int, default=8080, help="Puerto en el que escuchar (por defecto 8080)")
+	parser.add_argument("--json", default=ScheduleAssistant.jsonName, help=f"Catalogo de cursos en JSON (por defecto {ScheduleAssistant.jsonName}), recargado cuando cambia")
+	parser.add_argument("--procesos", type=int, default=1, help="Procesos que generan horarios (por defecto 1)")
+	parser.add_argument("--timeout", type=float, default=10, help="Segundos maximos para leer una solicitud o generar horarios (por defecto 10)")
+	parser.add_argument("--max-horarios", type=int, default=100, help="Maximo de horarios devueltos por consulta (por defecto 100)")
+	parser.add_argument("--max-secciones", type=int, default=2000, help="Maximo de secciones devueltas por un filtro (por defecto 2000)")
+	parser.add_argument("--compacto", action="store_true", help="Mantener el catalogo como registros compactos (menos memoria, generacion mas lenta)")
+	args = parser.parse_args()
+
+	server = ScheduleServer(args.json, args.procesos, args.timeout, args.max_horarios, args.max_secciones, compact=args.compacto)
+	try:
+		asyncio.run(server.serve(args.host, args.puerto))
+	except KeyboardInterrupt:
+		pass
@@ -0,0 +1,58 @@
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+import contextlib
+import io
+import tempfile
+import unittest
+
+# Table as the ones read by tabula: header in columns and numeric cells as floats (NaN when empty)
+class Frame:
+
+	def __init__(self, columns, rows):
+		self.columns = columns
+		self.rows = rows
+
+	def itertuples(self, index=False, name=None):
+		return iter(self.rows)
+
+# Courses dictionary loaded back from the CSV saved while parsing the pdf
+class CSVRoundTripTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = tempfile.TemporaryDirectory()
+		with contextlib.redirect_stdout(io.StringIO()):
+			self.assistant = benchmark.syntheticAssistant([benchmark.header])
+		self.assistant.csvName = os.path.join(self.dir.name, "horarios.csv")
+
+	def tearDown(self):
+		self.dir.cleanup()
+
+	# Builds pdf tables from synthetic rows, with a numeric malla and some sections without seats
+	def pdfTables(self):
+		rows = []
+		for i, row in enumerate(benchmark.syntheticTable(30, 4, 2, 0.3, 0)[1:]):
+			row = list(row)
+			row[3] = 2018.0
+			row[6] = float(row[6])
+			row[11], row[12] = (float("nan"), float("nan")) if i % 7 == 0 else (float(row[11]), float(row[12]))
+			rows.append(tuple(row))
+		return [Frame(benchmark.header, rows[:100]), Frame(benchmark.header, rows[100:])]
+
+	# Loading the CSV must give the same dictionary (and types) as parsing the pdf
+	def testLoadCSVEqualsPdf(self):
+		tables = self.pdfTables()
+		self.assistant.readPdf = lambda content : tables
+		self.assistant.saveDataCSV = True
+		with contextlib.redirect_stdout(io.StringIO()):
+			fromPdf = self.assistant.streamPdf(b"")
+			fromCSV = self.assistant.loadCSV()
+		self.assertEqual(fromCSV, fromPdf)
+		course = next(iter(fromCSV.values()))
+		self.assertEqual(course["malla"], 2018)
+		self.assertEqual(self.assistant.diffCatalogs(fromPdf, fromCSV), self.assistant.diffCatalogs(fromPdf, fromPdf))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduleAssistant import CompactRecord
+from server import ScheduleServer
+import benchmark
+import asyncio
+import contextlib
+import io
+import json
+import tempfile
+import time
+import unittest
+
+# Schedule generation of the server on a synthetic catalog
+class GenerateSchedulesTest(unittest.TestCase):
+
+	# Writes a synthetic catalog whose schedules of many courses take far longer than the timeout to count
+	def setUp(self):
+		self.dir = tempfile.TemporaryDirectory()
+		self.jsonName = os.path.join(self.dir.name, "horarios.json")
+		with contextlib.redirect_stdout(io.StringIO()):
+			assistant = benchmark.syntheticAssistant(benchmark.syntheticTable(40, 8, 2, 0, 0))
+		with open(self.jsonName, "w") as file:
+			json.dump(assistant.coursesDataDict, file, default=CompactRecord.toDict)
+		self.codes = list(assistant.coursesDataDict)
+
+	def tearDown(self):
+		self.dir.cleanup()
+
+	# Runs a slow query that times out and then a fast one, returning their (status, seconds)
+	async def runQueries(self, server):
+		with contextlib.redirect_stdout(io.StringIO()):
+			await server.reloadCatalog()
+		results = []
+		try:
+			for query in [
+				{"cursos": self.codes[:14], "restricciones": {"maxHuecosDia": 20}, "maxCombinaciones": None},
+				{"cursos": self.codes[:2], "contar": False}
+			]:
+				start = time.perf_counter()
+				status, body = await server.generateSchedules(query)
+				results.append((status, time.perf_counter() - start))
+		finally:
+			server.executor.shutdown(wait=False, cancel_futures=True)
+		return results
+
+	# A query that times out must not keep the only worker busy for the next one
+	def testTimeoutDoesNotBlockNextQuery(self):
+		server = ScheduleServer(self.jsonName, workers=1, timeout=1)
+		(slowStatus, slowTime), (fastStatus, fastTime) = asyncio.run(self.runQueries(server))
+		self.assertEqual(slowStatus, 504)
+		self.assertLess(slowTime, server.timeout + 2)
+		self.assertEqual(fastStatus, 200)
+		self.assertLess(fastTime, server.timeout)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,41 @@
+from scheduleAssistant import ScheduleAssistant
+import argparse
+import os
+
+# Parses a watched section argument as CODIGO:SECCION into (code, section)
+def sectionArg(value):
+	code, sep, sec = value.partition(":")
+	if sep == "" or code.strip() == "" or sec.strip() == "":
+		raise argparse.ArgumentTypeError(f"seccion invalida '{value}', se espera CODIGO:SECCION (ej. CS1111:1)")
+	return code.strip(), sec.strip()
+
+parser = argparse.ArgumentParser(description="Vigila las vacantes de secciones de cursos y emite un evento (JSON) cada vez que cambian")
+parser.add_argument("secciones", nargs="+", type=sectionArg, help="Secciones a vigilar como CODIGO:SECCION (ej. CS1111:1)")
+parser.add_argument("--intervalo", type=float, default=300, help="Segundos entre cada actualizacion de la data (por defecto 300)")
+parser.add_argument("--jitter", type=float, default=0.1, help="Variacion aleatoria del intervalo, como fraccion (por defecto 0.1)")
+parser.add_argument("--iteraciones", type=int, default=None, help="Cantidad de actualizaciones antes de terminar (por defecto sin limite)")
+parser.add_argument("--archivo", default="", help="Archivo al que agregar los eventos (JSON lines)")
+parser.add_argument("--webhook", default="", help="URL a la que enviar (POST) cada evento")
+parser.add_argument("--csv", action="store_true", help="Guardar tambien el CSV en cada actualizacion")
+args = parser.parse_args()
+
+# Credentials for the browser fallback (used only if the saved session can't fetch the pdf)
+assistant = ScheduleAssistant(os.environ.get("UTEC_EMAIL", ""), os.environ.get("UTEC_PASSWORD", ""))
+assistant.logCurrentProcess = False
+assistant.saveDataCSV = args.csv
+
+if os.path.exists(assistant.jsonName):
+	assistant.loadJSON()
+elif os.path.exists(assistant.pdfName):
+	assistant.pdfToDict()
+else:
+	assistant.refreshFromSource()
+
+assistant.watchSeats(
+	args.secciones,
+	args.intervalo,
+	args.jitter,
+	args.iteraciones,
+	args.archivo,
+	args.webhook
+)